@@ -1,7 +1,12 @@
 import streamlit as st
-from tradingview_ta import TA_Handler, Interval
+from tradingview_ta import Interval
+from maverick_fetch import DEFAULT_TIMEOUT, fetch_multiple_data
+from maverick_cache import AnalysisCache
 from discord_webhook import DiscordWebhook, DiscordEmbed
 
+# Analysis cache shared on disk with the collector and the dashboards
+cache = AnalysisCache()
+
 # Function to retrieve potential bullish symbols based on analysis results
 def select_potential_bullish_symbols(analysis_results):
     bullish_symbols = []
@@ -39,26 +44,21 @@ def main():
     # List to store symbols with "STRONG_BUY" recommendation
     buy_signals = []
 
-    for symbol in symbols:
-        try:
-            output = TA_Handler(symbol=symbol,
-                                screener='Crypto',
-                                exchange='Binance',
-                                interval=Interval.INTERVAL_1_HOUR)
-
-            # Step 6: Retrieve the analysis results
-            analysis = output.get_analysis()
+    # Step 6: Retrieve the analysis results, batched and shared through the cache
+    data = fetch_multiple_data(symbols, 'Binance', 'Crypto', [Interval.INTERVAL_1_HOUR], timeout=DEFAULT_TIMEOUT, cache=cache)
 
-            # Check if the recommendation is "STRONG_BUY" >= 1 and SELL == 0
-            if analysis.summary["RECOMMENDATION"] == "NEUTRAL" and analysis.summary.get("NEUTRAL", 0) >= 11:
+    for symbol in symbols:
+        analysis = data[(symbol, Interval.INTERVAL_1_HOUR)]
+        if analysis is None:
+            continue  # Ignore errors for now
 
-                # Check if the symbol meets the defined criteria
-                if is_potential_bullish(analysis.indicators):
-                    # Store the symbol in the list
-                    buy_signals.append(symbol)
+        # Check if the recommendation is "STRONG_BUY" >= 1 and SELL == 0
+        if analysis.summary["RECOMMENDATION"] == "NEUTRAL" and analysis.summary.get("NEUTRAL", 0) >= 11:
 
-        except Exception as e:
-            pass  # Ignore errors for now
+            # Check if the symbol meets the defined criteria
+            if is_potential_bullish(analysis.indicators):
+                # Store the symbol in the list
+                buy_signals.append(symbol)
 
     # Discord webhook setup
     webhook_url = 'https://discordapp.com/api/webhooks/1138581753620074497/tbiRIAVqsxurA-PXZuKaQODonm6c23VAE-zH_nN4ckawABxMCsUxR2NjJPw3KzlsHy9p'
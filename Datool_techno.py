@@ -1,8 +1,13 @@
 import streamlit as st
 import json
-from tradingview_ta import TA_Handler, Interval
+from tradingview_ta import Interval
+from maverick_fetch import DEFAULT_TIMEOUT, fetch_multiple_data
+from maverick_cache import AnalysisCache
 from discord_webhook import DiscordWebhook, DiscordEmbed
 
+# Analysis cache shared on disk with the collector and the dashboards
+cache = AnalysisCache()
+
 # Function to load symbols from the bnbpairs.json file
 def load_symbols_from_json(file_path):
     with open(file_path, 'r') as file:
@@ -16,18 +21,15 @@ def is_potential_bullish(indicators):
 
 def select_potential_bullish_symbols(symbols):
     bullish_symbols = []
+    data = fetch_multiple_data(symbols, 'Binance', 'Crypto', [Interval.INTERVAL_1_HOUR], timeout=DEFAULT_TIMEOUT, cache=cache)
     for symbol in symbols:
-        try:
-            output = TA_Handler(symbol=symbol,
-                                screener='Crypto',
-                                exchange='Binance',
-                                interval=Interval.INTERVAL_1_HOUR)
-            analysis = output.get_analysis()
-            if analysis.summary["RECOMMENDATION"] == "NEUTRAL" and analysis.summary.get("NEUTRAL", 0) >= 11:
-                if is_potential_bullish(analysis.indicators):
-                    bullish_symbols.append(symbol)
-        except Exception as e:
-            st.error(f"Error processing symbol {symbol}: {str(e)}")
+        analysis = data[(symbol, Interval.INTERVAL_1_HOUR)]
+        if analysis is None:
+            st.error(f"Error processing symbol {symbol}: no analysis")
+            continue
+        if analysis.summary["RECOMMENDATION"] == "NEUTRAL" and analysis.summary.get("NEUTRAL", 0) >= 11:
+            if is_potential_bullish(analysis.indicators):
+                bullish_symbols.append(symbol)
     return bullish_symbols
 
 def setup_discord_notification(buy_signals):
@@ -1,9 +1,16 @@
 import streamlit as st
 import pandas as pd
-from tradingview_ta import TA_Handler, Interval
+import numpy as np
+from tradingview_ta import Interval
 import io
-from datetime import datetime
+from datetime import datetime, timezone
 import os
+from maverick_async import fetch_grid
+from maverick_cache import AnalysisCache
+from maverick_quarantine import SymbolQuarantine
+from maverick_scoring import score_matrix
+from maverick_store import MISSING, SnapshotStore
+from maverick_parquet import ParquetArchive
 
 # Set the page config
 st.set_page_config(
@@ -37,6 +44,17 @@ st.markdown("""
     </style>
     """, unsafe_allow_html=True)
 
+# Analysis cache shared on disk with the collector and the dashboards
+cache = AnalysisCache()
+
+# Momentum history, partitioned by date (MAVERICK_ARCHIVE_PATH, momentum_archive by default)
+archive = ParquetArchive()
+
+# Symbols the scanner stopped answering for, shared by all sessions and rechecked on an exponential schedule
+@st.cache_resource
+def get_quarantine():
+    return SymbolQuarantine()
+
 # List of symbols to be analyzed
 symbols = [
     "10000LADYSUSDT.P", "10000NFTUSDT.P", "1000BONKUSDT.P", "1000BTTUSDT.P", 
@@ -104,35 +122,81 @@ indicator_weights = {
     'ATR': 0.10             # Average True Range
 }
 
-def fetch_all_data(symbol, exchange, screener, interval):
-    """Fetches trading data for a given symbol and interval from TradingView."""
-    handler = TA_Handler(
-        symbol=symbol,
-        exchange=exchange,
-        screener=screener,
-        interval=interval,
-        timeout=None
-    )
-    analysis = handler.get_analysis()
-    return analysis
-
-def calculate_weighted_indicators(analysis):
-    """Calculates weighted values for indicators based on defined weights."""
-    weighted_data = {}
-    for indicator, weight in indicator_weights.items():
-        value = analysis.indicators.get(indicator, 0)  # Default to 0 if indicator data is missing
-        weighted_data[indicator] = value * weight
-    return weighted_data
-
-def calculate_momentum_score(data):
-    """Calculates momentum score based on analysis recommendations."""
-    weights = {'STRONG_BUY': 2, 'BUY': 1, 'NEUTRAL': 0, 'SELL': -1, 'STRONG_SELL': -2}
-    score = 0
-    for interval, analysis in data.items():
-        if analysis:
-            rating = analysis.summary['RECOMMENDATION'].upper()
-            score += weights.get(rating, 0)
-    return score
+def calculate_weighted_indicators(store):
+    """float32 symbols x intervals x indicators tensor of the indicators scaled by indicator_weights.
+
+    An indicator the scanner didn't return counts as 0, as before; cells without any analysis stay NaN.
+    """
+    weights = np.array([indicator_weights[indicator] for indicator in store.indicators], dtype=np.float32)
+    weighted = np.nan_to_num(store.values * weights)
+    return np.where(store.available[:, :, np.newaxis], weighted, np.float32(np.nan))
+
+# Interval weightings offered next to the slider profile in the comparison view
+weight_profiles = {
+    "Corto plazo": {
+        Interval.INTERVAL_1_MINUTE: 0.3, Interval.INTERVAL_5_MINUTES: 0.3, Interval.INTERVAL_15_MINUTES: 0.2,
+        Interval.INTERVAL_30_MINUTES: 0.1, Interval.INTERVAL_1_HOUR: 0.1, Interval.INTERVAL_2_HOURS: 0.0,
+        Interval.INTERVAL_4_HOURS: 0.0, Interval.INTERVAL_1_DAY: 0.0
+    },
+    "Equilibrado": {
+        Interval.INTERVAL_1_MINUTE: 0.1, Interval.INTERVAL_5_MINUTES: 0.1, Interval.INTERVAL_15_MINUTES: 0.2,
+        Interval.INTERVAL_30_MINUTES: 0.1, Interval.INTERVAL_1_HOUR: 0.2, Interval.INTERVAL_2_HOURS: 0.1,
+        Interval.INTERVAL_4_HOURS: 0.1, Interval.INTERVAL_1_DAY: 0.1
+    },
+    "Largo plazo": {
+        Interval.INTERVAL_1_MINUTE: 0.0, Interval.INTERVAL_5_MINUTES: 0.0, Interval.INTERVAL_15_MINUTES: 0.1,
+        Interval.INTERVAL_30_MINUTES: 0.1, Interval.INTERVAL_1_HOUR: 0.2, Interval.INTERVAL_2_HOURS: 0.2,
+        Interval.INTERVAL_4_HOURS: 0.2, Interval.INTERVAL_1_DAY: 0.2
+    }
+}
+
+def fetch_snapshot(exchange, screener, intervals, progress_bar):
+    """Fetches every (symbol, interval) once; everything weight-dependent is computed from the result."""
+    all_data = fetch_grid(symbols, exchange, screener, list(intervals),
+                          on_progress=lambda completed, total: progress_bar.progress(completed / total),
+                          cache=cache, quarantine=get_quarantine())
+    # Ratings and the weighted indicators as dense arrays; weighted indicators don't depend on
+    # the interval weights, so they are computed once per fetch
+    store = SnapshotStore.from_analyses(all_data, symbols, list(intervals), indicators=list(indicator_weights))
+    taken_at = datetime.now(timezone.utc)
+    
+    return {
+        "exchange": exchange,
+        "screener": screener,
+        # Local time for display and the download, UTC for the archive
+        "fecha": taken_at.astimezone().strftime("%Y-%m-%d %H:%M:%S"),
+        "timestamp": taken_at,
+        "store": store,
+        "weighted": calculate_weighted_indicators(store)
+    }
+
+def score_profiles(snapshot, profiles):
+    """Scores of every symbol under each {interval: weight} profile as one matrix product.
+
+    Returns a symbols x profiles DataFrame, restricted to symbols with at least one analysis.
+    """
+    codes = snapshot["store"].recommendations
+    intervals = list(next(iter(profiles.values())))
+    weights = np.column_stack([[profile[interval] for interval in intervals] for profile in profiles.values()])
+    available = (codes != MISSING).any(axis=1)
+    scores = score_matrix(codes, weights)
+    return pd.DataFrame(scores[available], index=np.asarray(symbols, dtype=object)[available], columns=list(profiles))
+
+def build_results(snapshot, scores):
+    """Results frame of the export (long symbols first, then short) for one profile's scores.
+
+    The indicator columns ({indicator}_{interval}) are one reshaped slice of the weighted tensor.
+    """
+    store = snapshot["store"]
+    rows = [store.symbol_index[symbol] for symbol in scores.index]
+    columns = [f'{indicator}_{interval}' for interval in store.intervals for indicator in store.indicators]
+    weighted = snapshot["weighted"][rows].reshape(len(rows), len(columns))
+    results = pd.concat([
+        pd.DataFrame({"Symbol": scores.index, "Momentum Score": scores.values, "Fecha": snapshot["fecha"]}),
+        pd.DataFrame(weighted, columns=columns)
+    ], axis=1)
+    long_first = results["Momentum Score"] > 0
+    return pd.concat([results[long_first], results[~long_first]], ignore_index=True)
 
 def main():
     st.title('Análisis de Puntuación de Momentum en Criptomonedas')
@@ -140,7 +204,7 @@ def main():
     exchange = st.text_input("Exchange", "BYBIT")
     screener = st.text_input("Screener", "crypto")
     
-    # Slider controls for setting interval weights
+    # Slider controls for setting interval weights; moving one re-ranks the fetched data without refetching
     intervals = {
         Interval.INTERVAL_1_MINUTE: st.slider("Intervalo 1 Minuto", 0.0, 1.0, 0.1),
         Interval.INTERVAL_5_MINUTES: st.slider("Intervalo 5 Minutos", 0.0, 1.0, 0.1),
@@ -152,83 +216,88 @@ def main():
         Interval.INTERVAL_1_DAY: st.slider("Intervalo 1 Día", 0.0, 1.0, 0.1)
     }
     
+    fetched_now = False
     if st.button("Calcular Puntuaciones de Momentum"):
-        results_long = []
-        results_short = []
-        error_symbols = []
-        current_datetime = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        for symbol in symbols:
-            data = {}
-            weighted_indicators_data = {}
-            for interval, weight in intervals.items():
-                try:
-                    analysis = fetch_all_data(symbol, exchange, screener, interval)
-                    data[interval] = analysis
-                    weighted_indicators_data[interval] = calculate_weighted_indicators(analysis)
-                except Exception as e:
-                    data[interval] = None
-                    weighted_indicators_data[interval] = {indicator: None for indicator in indicator_weights}
-            
-            if all(value is None for value in data.values()):
-                error_symbols.append(symbol)
-            else:
-                weighted_score = sum(weight * calculate_momentum_score({interval: data[interval]}) for interval, weight in intervals.items())
-                result = {
-                    "Symbol": symbol,
-                    "Momentum Score": weighted_score,
-                    "Fecha": current_datetime
-                }
-                for interval in weighted_indicators_data:
-                    for indicator, value in weighted_indicators_data[interval].items():
-                        result[f'{indicator}_{interval}'] = value
-                
-                if weighted_score > 0:
-                    results_long.append(result)
-                else:
-                    results_short.append(result)
+        progress_bar = st.progress(0)
+        st.session_state['snapshot'] = fetch_snapshot(exchange, screener, intervals, progress_bar)
+        fetched_now = True
+    
+    snapshot = st.session_state.get('snapshot')
+    if snapshot is None:
+        return
+    st.caption(f"Datos de {snapshot['exchange']} ({snapshot['screener']}) obtenidos el {snapshot['fecha']}")
+    
+    compared = st.multiselect("Comparar con perfiles", list(weight_profiles))
+    profiles = {"Actual": intervals}
+    profiles.update({name: weight_profiles[name] for name in compared})
+    scores = score_profiles(snapshot, profiles)
+    error_symbols = [symbol for symbol in symbols if symbol not in scores.index]
+    
+    if not scores.empty:
+        all_results_df = build_results(snapshot, scores["Actual"])
+        avg_momentum_score = all_results_df['Momentum Score'].mean()
+        all_results_df['Promedio Total de Puntuaciones de Momentum'] = avg_momentum_score
+        if fetched_now:
+            # One Parquet archive instead of a new CSV per run; the indicator columns stay in the download
+            archive.write(pd.DataFrame({
+                "Symbol": all_results_df['Symbol'],
+                "Momentum Score": all_results_df['Momentum Score'],
+                "Timestamp": pd.Timestamp(snapshot['timestamp']),
+                "Average Momentum": avg_momentum_score
+            }))
+            st.write(f"Datos guardados en {archive.path}")
         
-        all_scores = results_long + results_short
-        if all_scores:
-            avg_momentum_score = sum(item['Momentum Score'] for item in all_scores) / len(all_scores)
-            all_results_df = pd.DataFrame(all_scores)
-            all_results_df['Promedio Total de Puntuaciones de Momentum'] = avg_momentum_score
-            file_name = f"momentum_data/momentum_scores_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-            all_results_df.to_csv(file_name, index=False)
-            st.write(f"Datos guardados en {file_name}")
+        results_long_df = all_results_df[all_results_df['Momentum Score'] > 0].drop(columns='Promedio Total de Puntuaciones de Momentum')
+        results_short_df = all_results_df[all_results_df['Momentum Score'] <= 0].drop(columns='Promedio Total de Puntuaciones de Momentum')
+
+        if not results_long_df.empty:
+            results_long_df = results_long_df.reset_index(drop=True)
+            results_long_df.index += 1  # Numerar la primera columna en orden ascendente
+            results_long_df.index.name = 'Índice'
+            top_20_long_symbols = results_long_df.sort_values(by="Momentum Score", ascending=False).head(20)
+            st.write("Top 20 Símbolos para Posición Larga:")
+            st.table(top_20_long_symbols)
+
+        if not results_short_df.empty:
+            results_short_df = results_short_df.reset_index(drop=True)
+            results_short_df.index += 1  # Numerar la primera columna en orden ascendente
+            results_short_df.index.name = 'Índice'
+            top_20_short_symbols = results_short_df.sort_values(by="Momentum Score", ascending=True).head(20)
+            st.write("Top 20 Símbolos para Posición Corta:")
+            st.table(top_20_short_symbols)
+
+        st.write(f"Promedio Total de Puntuaciones de Momentum: {avg_momentum_score:.2f}")
         
-            if results_long:
-                results_long_df = pd.DataFrame(results_long)
-                results_long_df.index += 1  # Numerar la primera columna en orden ascendente
-                results_long_df.index.name = 'Índice'
-                top_20_long_symbols = results_long_df.sort_values(by="Momentum Score", ascending=False).head(20)
-                st.write("Top 20 Símbolos para Posición Larga:")
-                st.table(top_20_long_symbols)
-
-            if results_short:
-                results_short_df = pd.DataFrame(results_short)
-                results_short_df.index += 1  # Numerar la primera columna en orden ascendente
-                results_short_df.index.name = 'Índice'
-                top_20_short_symbols = results_short_df.sort_values(by="Momentum Score", ascending=True).head(20)
-                st.write("Top 20 Símbolos para Posición Corta:")
-                st.table(top_20_short_symbols)
-
-            st.write(f"Promedio Total de Puntuaciones de Momentum: {avg_momentum_score:.2f}")
-
-            csv_buffer = io.StringIO()
-            all_results_df.to_csv(csv_buffer)
-            csv_data = csv_buffer.getvalue()
-            st.download_button(
-                label="Descargar Puntuaciones de Momentum como CSV",
-                data=csv_data,
-                file_name='momentum_scores.csv',
-                mime='text/csv'
-            )
-        else:
-            st.write("No se pudieron obtener datos para los símbolos proporcionados.")
-
-        if error_symbols:
-            st.write(f"No se pudieron obtener datos para los siguientes símbolos: {', '.join(error_symbols)}")
+        if compared:
+            # Score and rank of every symbol under each profile, ordered by the slider profile
+            comparison = scores.round(2)
+            for name in profiles:
+                comparison[f"Rango {name}"] = scores[name].rank(ascending=False, method="min").astype(int)
+            comparison = comparison.sort_values("Actual", ascending=False)
+            comparison.index.name = 'Symbol'
+            st.write("Comparación de perfiles de ponderación:")
+            st.dataframe(comparison)
+            st.write("Promedio por perfil: " + ", ".join(f"{name} {scores[name].mean():.2f}" for name in profiles))
+
+        csv_buffer = io.StringIO()
+        all_results_df.to_csv(csv_buffer)
+        csv_data = csv_buffer.getvalue()
+        st.download_button(
+            label="Descargar Puntuaciones de Momentum como CSV",
+            data=csv_data,
+            file_name='momentum_scores.csv',
+            mime='text/csv'
+        )
+    else:
+        st.write("No se pudieron obtener datos para los símbolos proporcionados.")
+
+    if error_symbols:
+        st.write(f"No se pudieron obtener datos para los siguientes símbolos: {', '.join(error_symbols)}")
+
+    quarantined = get_quarantine().report()
+    if quarantined:
+        st.write("Símbolos en cuarentena (no se consultan hasta su próxima comprobación):")
+        st.table(pd.DataFrame(quarantined))
 
 if __name__ == "__main__":
     main()
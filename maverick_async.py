@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import math
+from concurrent.futures import ThreadPoolExecutor
+from maverick_fetch import DEFAULT_BATCH_SIZE, DEFAULT_TIMEOUT, chunk_symbols, request_batch, split_cached, fill_stale
+
+# Maximum number of scanner requests in flight at once
+DEFAULT_CONCURRENCY = 8
+# Share of a cycle's cells that may be retried, spread over at most this many retry rounds
+DEFAULT_RETRY_BUDGET = 0.25
+DEFAULT_RETRY_ROUNDS = 2
+
+async def _fetch_unit(loop, executor, semaphore, batch, exchange, screener, interval, timeout, limiter, quarantine):
+    # Each HTTP attempt is bounded by timeout; with a limiter the unit may also wait for tokens
+    # and back off between retries, so the overall deadline is left to the limiter
+    deadline = timeout if limiter is None else None
+    async with semaphore:
+        try:
+            # The blocking request gets the same timeout so its worker thread is freed too
+            analyses = await asyncio.wait_for(
+                loop.run_in_executor(executor, request_batch, batch, exchange, screener, interval, timeout, limiter,
+                                     quarantine),
+                deadline
+            )
+        except asyncio.TimeoutError:
+            logging.error(f"Timed out after {timeout}s fetching {len(batch)} symbols on {interval}")
+            analyses = {}
+        except Exception as e:
+            logging.error(f"Error fetching {len(batch)} symbols on {interval}: {str(e)}")
+            analyses = {}
+    return interval, batch, analyses
+
+async def iter_fetch_cells(symbols_by_interval, exchange, screener, concurrency=DEFAULT_CONCURRENCY,
+                           timeout=DEFAULT_TIMEOUT, batch_size=DEFAULT_BATCH_SIZE, limiter=None, quarantine=None):
+    """Yields ((symbol, interval), analysis) pairs as soon as each scanner request finishes.
+
+    symbols_by_interval maps each interval to the symbols to fetch for it. Failed or timed
+    out requests yield None for every cell they covered. With a RateLimiter every request
+    goes through it; successful responses are reported to the SymbolQuarantine, if any.
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        tasks = [
+            asyncio.ensure_future(_fetch_unit(loop, executor, semaphore, batch, exchange, screener, interval, timeout,
+                                              limiter, quarantine))
+            for interval, symbols in symbols_by_interval.items()
+            for batch in chunk_symbols(list(symbols), batch_size)
+        ]
+        try:
+            for task in asyncio.as_completed(tasks):
+                interval, batch, analyses = await task
+                for symbol in batch:
+                    yield (symbol, interval), analyses.get(symbol)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+def iter_fetch_results(symbols, exchange, screener, intervals, concurrency=DEFAULT_CONCURRENCY,
+                       timeout=DEFAULT_TIMEOUT, batch_size=DEFAULT_BATCH_SIZE, limiter=None, quarantine=None):
+    """Async iterator over the full symbols x intervals grid, see iter_fetch_cells."""
+    return iter_fetch_cells({interval: symbols for interval in intervals}, exchange, screener,
+                            concurrency, timeout, batch_size, limiter, quarantine)
+
+def fetch_cells(symbols_by_interval, exchange, screener, concurrency=DEFAULT_CONCURRENCY,
+                timeout=DEFAULT_TIMEOUT, batch_size=DEFAULT_BATCH_SIZE, on_progress=None, cache=None,
+                limiter=None, stale_fallback=True, quarantine=None):
+    """Blocking wrapper around iter_fetch_cells.
+
+    Returns a dict keyed by (symbol, interval). on_progress(completed, total) is called
+    after every cell so callers can drive a progress bar. With an AnalysisCache only cells
+    missing from it are requested, fresh results are stored back and, unless stale_fallback
+    is False, failed cells fall back to expired entries. With a SymbolQuarantine, quarantined
+    symbols are not requested until their recheck and map to None.
+    """
+    total = sum(len(symbols) for symbols in symbols_by_interval.values())
+    data = {}
+    if cache is not None:
+        data, symbols_by_interval = split_cached(symbols_by_interval, exchange, screener, cache)
+    if quarantine is not None:
+        symbols_by_interval, skipped = quarantine.split(exchange, screener, symbols_by_interval)
+        data.update(dict.fromkeys(skipped))
+
+    async def collect():
+        fetched = {}
+        async for key, analysis in iter_fetch_cells(symbols_by_interval, exchange, screener,
+                                                     concurrency, timeout, batch_size, limiter, quarantine):
+            fetched[key] = analysis
+            if on_progress:
+                on_progress(len(data) + len(fetched), total)
+        return fetched
+
+    fetched = asyncio.run(collect())
+    if cache is not None:
+        cache.set_many(exchange, screener, fetched)
+    data.update(fetched)
+    if cache is not None and stale_fallback:
+        fill_stale(data, exchange, screener, cache, quarantine)
+    return data
+
+def failed_cells(data):
+    """{interval: [symbols]} of the cells in data that have no analysis."""
+    failed = {}
+    for (symbol, interval), analysis in data.items():
+        if analysis is None:
+            failed.setdefault(interval, []).append(symbol)
+    return failed
+
+def fetch_cells_with_retry(symbols_by_interval, exchange, screener, retry_rounds=DEFAULT_RETRY_ROUNDS,
+                           retry_budget=DEFAULT_RETRY_BUDGET, cache=None, quarantine=None, **fetch_options):
+    """fetch_cells, then refetches only the cells that failed, within the same cycle.
+
+    At most retry_budget (a share of the requested cells) are retried in total, over at most
+    retry_rounds rounds. Returns (data, report); report holds the requested, fetched, failed and
+    retried cell counts, the number of rounds and completeness, the share of requested cells
+    that ended up with a fresh analysis. Stale cache entries are only used for cells still
+    failed after the retries. Cells of quarantined symbols are neither requested nor retried,
+    report counts them as quarantined.
+    """
+    requested = sum(len(symbols) for symbols in symbols_by_interval.values())
+    budget = math.ceil(requested * retry_budget)
+    data = fetch_cells(symbols_by_interval, exchange, screener, cache=cache, stale_fallback=False,
+                       quarantine=quarantine, **fetch_options)
+
+    retried = 0
+    rounds = 0
+    while rounds < retry_rounds and retried < budget:
+        retry = {}
+        remaining = budget - retried
+        failed = failed_cells(data)
+        if quarantine is not None:
+            failed, _ = quarantine.split(exchange, screener, failed)
+        for interval, symbols in failed.items():
+            if remaining <= 0:
+                break
+            retry[interval] = symbols[:remaining]
+            remaining -= len(retry[interval])
+        if not retry:
+            break
+        rounds += 1
+        retried += sum(len(symbols) for symbols in retry.values())
+        logging.info(f"Retry round {rounds}: {sum(len(symbols) for symbols in retry.values())} failed cells")
+        data.update(fetch_cells(retry, exchange, screener, cache=cache, stale_fallback=False,
+                                quarantine=quarantine, **fetch_options))
+
+    fetched = sum(analysis is not None for analysis in data.values())
+    quarantined = 0
+    if quarantine is not None:
+        quarantined = len(quarantine.split(exchange, screener, failed_cells(data))[1])
+    report = {
+        "requested": requested,
+        "fetched": fetched,
+        "failed": requested - fetched,
+        "retried": retried,
+        "rounds": rounds,
+        "quarantined": quarantined,
+        "completeness": fetched / requested if requested else 1.0
+    }
+    if cache is not None:
+        fill_stale(data, exchange, screener, cache, quarantine)
+    return data, report
+
+def fetch_grid(symbols, exchange, screener, intervals, concurrency=DEFAULT_CONCURRENCY,
+               timeout=DEFAULT_TIMEOUT, batch_size=DEFAULT_BATCH_SIZE, on_progress=None, cache=None,
+               limiter=None, quarantine=None):
+    """Blocking drop-in for the nested symbol/interval loop, see fetch_cells."""
+    return fetch_cells({interval: symbols for interval in intervals}, exchange, screener,
+                       concurrency, timeout, batch_size, on_progress, cache, limiter, quarantine=quarantine)
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+
+# The two bands the dashboards always showed, kept as the default saved filters
+DEFAULT_BANDS = [
+    {"name": "Momentum 0.1 to 0.4 & Change 1.1 to 1.5", "score": (0.1, 0.4), "change": (1.1, 1.5), "ascending": False},
+    {"name": "Momentum -0.4 to -0.1 & Change -1.5 to -1.1", "score": (-0.4, -0.1), "change": (-1.5, -1.1), "ascending": True}
+]
+
+def make_band(name, score, change, ascending=None):
+    """Band filter dict; by default a band of rising changes lists the biggest change first."""
+    score = (min(score), max(score))
+    change = (min(change), max(change))
+    if ascending is None:
+        ascending = change[1] <= 0
+    return {"name": name, "score": score, "change": change, "ascending": ascending}
+
+def band_filter_sidebar(st):
+    """Sidebar to save (score, change) band filters; returns the saved bands that are switched on.
+
+    st is the app's streamlit module, so this module doesn't need streamlit to be importable.
+    """
+    if 'band_filters' not in st.session_state:
+        st.session_state['band_filters'] = list(DEFAULT_BANDS)
+
+    st.sidebar.title("Band Filters")
+    with st.sidebar.form("band_filter"):
+        score_range = st.slider("Momentum Score", -2.0, 2.0, (0.1, 0.4), 0.05)
+        change_range = st.slider("Change", -4.0, 4.0, (1.1, 1.5), 0.05)
+        name = st.text_input("Name", "")
+        if st.form_submit_button("Save band filter"):
+            name = name or f"Momentum {score_range[0]} to {score_range[1]} & Change {change_range[0]} to {change_range[1]}"
+            bands = [band for band in st.session_state['band_filters'] if band["name"] != name]
+            st.session_state['band_filters'] = bands + [make_band(name, score_range, change_range)]
+
+    names = [band["name"] for band in st.session_state['band_filters']]
+    active = st.sidebar.multiselect("Show band filters", names, default=names)
+    return [band for band in st.session_state['band_filters'] if band["name"] in active]
+
+class BandIndex:
+    """(score, change) of one snapshot, sorted by score, for inclusive band queries.
+
+    The score range is found with two binary searches; only the symbols inside it have their
+    change compared. Scores and changes are rounded to 2 decimals like the tables show them.
+    """
+
+    def __init__(self, symbols, scores, changes):
+        scores = np.round(np.asarray(scores, dtype=np.float64), 2)
+        changes = np.round(np.asarray(changes, dtype=np.float64), 2)
+        order = np.argsort(scores, kind='stable')
+        self.symbols = np.asarray(symbols, dtype=object)[order]
+        self.scores = scores[order]
+        self.changes = changes[order]
+
+    @classmethod
+    def from_scores(cls, scores, reference):
+        """Index of a {symbol: score} snapshot, Change measured against {symbol: reference score} (0 if absent)."""
+        symbols = list(scores)
+        values = np.fromiter(scores.values(), dtype=np.float64, count=len(symbols))
+        previous = np.array([reference.get(symbol, 0) for symbol in symbols], dtype=np.float64)
+        return cls(symbols, values, values - np.nan_to_num(previous))
+
+    def __len__(self):
+        return len(self.scores)
+
+    def query(self, score, change):
+        """Positions of the symbols with score and change inside the inclusive (low, high) ranges."""
+        start = np.searchsorted(self.scores, score[0] - 1e-9, side='left')
+        stop = np.searchsorted(self.scores, score[1] + 1e-9, side='right')
+        changes = self.changes[start:stop]
+        return start + np.flatnonzero((changes >= change[0] - 1e-9) & (changes <= change[1] + 1e-9))
+
+    def frame(self, positions, ascending=False):
+        """Symbol / Momentum Score / Change table of the given positions, ordered by change."""
+        df = pd.DataFrame({
+            'Symbol': self.symbols[positions],
+            'Momentum Score': self.scores[positions],
+            'Change': self.changes[positions]
+        })
+        return df.sort_values('Change', ascending=ascending, kind='stable').reset_index(drop=True)
+
+    def evaluate(self, bands):
+        """{band name: table} for every saved band filter."""
+        return {band["name"]: self.frame(self.query(band["score"], band["change"]), band["ascending"]) for band in bands}
@@ -0,0 +1,167 @@
+import argparse
+import logging
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timezone, timedelta
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+from tradingview_ta import TA_Handler, TradingView, Interval
+from maverick_fetch import DEFAULT_BATCH_SIZE, fetch_multiple_data
+from maverick_async import DEFAULT_CONCURRENCY, fetch_grid
+from maverick_ratelimit import RateLimiter
+from maverick_scanner_stub import ScannerStub, load_symbols, load_pairs
+from maverick_db import BulkWriter
+
+# Same weights as the collector in maverickv2_2.py
+intervals = {
+    Interval.INTERVAL_1_MINUTE: 0.1,
+    Interval.INTERVAL_5_MINUTES: 0.1,
+    Interval.INTERVAL_15_MINUTES: 0.2,
+    Interval.INTERVAL_30_MINUTES: 0.1,
+    Interval.INTERVAL_1_HOUR: 0.2,
+    Interval.INTERVAL_2_HOURS: 0.1,
+    Interval.INTERVAL_4_HOURS: 0.2,
+    Interval.INTERVAL_1_DAY: 0.1
+}
+
+RATINGS = {'STRONG_BUY': 2, 'BUY': 1, 'NEUTRAL': 0, 'SELL': -1, 'STRONG_SELL': -2}
+
+def fetch_serial(symbols, exchange, screener, intervals):
+    """The original path: one TA_Handler request per (symbol, interval)."""
+    data = {}
+    for symbol in symbols:
+        for interval in intervals:
+            try:
+                handler = TA_Handler(symbol=symbol, exchange=exchange, screener=screener, interval=interval, timeout=30)
+                data[(symbol, interval)] = handler.get_analysis()
+            except Exception:
+                data[(symbol, interval)] = None
+    return data
+
+def run_cycle(engine, universe, batch_size, concurrency, limiter=None):
+    """One collector cycle: fetch every cell of every (exchange, symbols) group and score it."""
+    results = []
+    cells = 0
+    fetched = 0
+    for exchange, symbols in universe:
+        if engine == "serial":
+            data = fetch_serial(symbols, exchange, "crypto", intervals)
+        elif engine == "batched":
+            data = fetch_multiple_data(symbols, exchange, "crypto", intervals, batch_size=batch_size, timeout=30,
+                                       limiter=limiter)
+        else:
+            data = fetch_grid(symbols, exchange, "crypto", intervals, concurrency=concurrency, batch_size=batch_size,
+                              limiter=limiter)
+        cells += len(data)
+        fetched += sum(analysis is not None for analysis in data.values())
+        for symbol in symbols:
+            score = sum(weight * RATINGS.get(data[(symbol, interval)].summary['RECOMMENDATION'].upper(), 0)
+                        for interval, weight in intervals.items() if data[(symbol, interval)] is not None)
+            results.append(score)
+    return results, fetched / cells if cells else 0.0
+
+def snapshot_frame(symbols, timestamp, rng):
+    """A momentum_scores snapshot shaped like the collector's."""
+    scores = rng.uniform(-2, 2, len(symbols)).round(2)
+    return pd.DataFrame({
+        "Symbol": symbols,
+        "Momentum Score": scores,
+        "Timestamp": timestamp,
+        "Average Momentum": scores.mean()
+    })
+
+def benchmark_writers(db_url, symbols, cycles):
+    """Rows per second of to_sql against BulkWriter, each appending cycles snapshots to its own table."""
+    engine = create_engine(db_url)
+    writer = BulkWriter(engine)
+    rng = np.random.default_rng(0)
+    start = datetime.now(timezone.utc)
+    frames = [snapshot_frame(symbols, start + timedelta(minutes=cycle), rng) for cycle in range(cycles)]
+    writers = {
+        "to_sql": lambda df, table: df.to_sql(table, con=engine, if_exists='append', index=False),
+        f"bulk ({writer.method})": writer.write
+    }
+    for name, write in writers.items():
+        table = f"benchmark_{name.split()[0]}"
+        with engine.begin() as connection:
+            connection.execute(text(f'DROP TABLE IF EXISTS "{table}"'))
+        times = []
+        for df in frames:
+            started = time.perf_counter()
+            write(df, table)
+            times.append(time.perf_counter() - started)
+        rows = sum(len(df) for df in frames)
+        print(f"{name}: {rows / sum(times):,.0f} rows/s, median {statistics.median(times) * 1000:.1f}ms "
+              f"per {len(symbols)}-row snapshot, max {max(times) * 1000:.1f}ms")
+        with engine.begin() as connection:
+            connection.execute(text(f'DROP TABLE IF EXISTS "{table}"'))
+
+def main():
+    parser = argparse.ArgumentParser(description="Collector cycle benchmark against the local scanner stand-in")
+    parser.add_argument("--engine", choices=["serial", "batched", "async", "writer"], default="async",
+                        help="writer: time the momentum_scores writes instead of the fetch")
+    parser.add_argument("--db-url", default=None,
+                        help="database for --engine writer (default: a temporary SQLite file)")
+    parser.add_argument("--universe", choices=["perps", "pairs", "all"], default="perps",
+                        help="perps: the .P symbols of maverickv2_0.py, pairs: bnbpairs.json")
+    parser.add_argument("--cycles", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=None)
+    parser.add_argument("--limit-rate", type=float, default=None,
+                        help="route requests through a RateLimiter with this many requests per second")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    perps, pairs = load_symbols(), load_pairs()
+    if args.engine == "writer":
+        symbols = perps + pairs if args.universe == "all" else (pairs if args.universe == "pairs" else perps)
+        if args.db_url:
+            benchmark_writers(args.db_url, symbols, args.cycles)
+            return
+        with tempfile.TemporaryDirectory() as directory:
+            benchmark_writers(f"sqlite:///{os.path.join(directory, 'benchmark.sqlite')}", symbols, args.cycles)
+        return
+
+    universe = []
+    if args.universe in ("perps", "all"):
+        universe.append(("BYBIT", perps))
+    if args.universe in ("pairs", "all"):
+        universe.append(("BINANCE", pairs))
+
+    stub = ScannerStub(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                       throttle_rate=args.throttle_rate, universe=perps + pairs)
+    limiter = RateLimiter(rate=args.limit_rate) if args.limit_rate else None
+    scan_url = TradingView.scan_url
+    TradingView.scan_url = stub.start()
+    try:
+        cycle_times = []
+        for cycle in range(args.cycles):
+            start = time.perf_counter()
+            scores, completeness = run_cycle(args.engine, universe, args.batch_size, args.concurrency, limiter)
+            cycle_times.append(time.perf_counter() - start)
+            print(f"cycle {cycle + 1}: {cycle_times[-1]:.2f}s, {len(scores)} symbols scored, "
+                  f"{completeness:.1%} of cells fetched")
+    finally:
+        TradingView.scan_url = scan_url
+        stub.stop()
+
+    symbols = sum(len(symbols) for _, symbols in universe)
+    total = sum(cycle_times)
+    print(f"engine={args.engine} symbols={symbols} intervals={len(intervals)} batch_size={args.batch_size} "
+          f"concurrency={args.concurrency} latency={args.latency}s")
+    print(f"requests: {stub.total_requests()} ({stub.counts}), {stub.total_requests() / total:.1f} req/s")
+    print(f"cycle time: mean {statistics.mean(cycle_times):.2f}s, "
+          f"median {statistics.median(cycle_times):.2f}s, max {max(cycle_times):.2f}s")
+    if limiter is not None:
+        print(f"rate limiter: {limiter.status()}")
+
+if __name__ == "__main__":
+    main()
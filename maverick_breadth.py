@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+from sqlalchemy import inspect, text
+
+# Average Momentum bands of update_plot: above is bullish (green), below -0.5 bearish (red)
+BREADTH_THRESHOLD = 0.5
+# Symbol every score is also expressed relative to
+BENCHMARK = "BTCUSDT.P"
+PERCENTILES = (10, 25, 50, 75, 90)
+
+# Table holding one breadth row per snapshot
+BREADTH_TABLE = 'momentum_breadth'
+# Columns added after the table was first created by to_sql, with their SQL types
+ADDED_COLUMNS = {"Regime": "SMALLINT"}
+# Engine URLs whose breadth table already has ADDED_COLUMNS
+_upgraded = set()
+
+def breadth_stats(symbols, scores, benchmark=BENCHMARK, threshold=BREADTH_THRESHOLD):
+    """Cross-sectional stats of one snapshot, computed in a single vectorized pass.
+
+    Returns a dict with the symbol count, mean, standard deviation, the PERCENTILES, the share of
+    symbols above threshold and below -threshold, and the benchmark's score (None if absent).
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    stats = {"Symbols": len(scores), "Mean": None, "Std": None}
+    stats.update({f"P{p}": None for p in PERCENTILES})
+    stats.update({"Share Above": None, "Share Below": None, "BTC Score": None})
+    if not len(scores):
+        return stats
+    stats["Mean"] = float(scores.mean())
+    stats["Std"] = float(scores.std())
+    stats.update({f"P{p}": float(value) for p, value in zip(PERCENTILES, np.percentile(scores, PERCENTILES))})
+    stats["Share Above"] = float((scores > threshold).mean())
+    stats["Share Below"] = float((scores < -threshold).mean())
+    symbols = list(symbols)
+    if benchmark in symbols:
+        stats["BTC Score"] = float(scores[symbols.index(benchmark)])
+    return stats
+
+def breadth_frame(timestamp, stats):
+    """One momentum_breadth row."""
+    return pd.DataFrame([{"Timestamp": timestamp, **stats}])
+
+def upgrade_breadth_table(engine):
+    """Adds ADDED_COLUMNS missing from an existing breadth table, which append would reject."""
+    inspector = inspect(engine)
+    if not inspector.has_table(BREADTH_TABLE):
+        return
+    existing = {column["name"] for column in inspector.get_columns(BREADTH_TABLE)}
+    # IF NOT EXISTS covers another app adding the column at the same time; SQLite doesn't know it
+    guard = "IF NOT EXISTS " if engine.dialect.name == "postgresql" else ""
+    with engine.begin() as connection:
+        for name, sql_type in ADDED_COLUMNS.items():
+            if name not in existing:
+                connection.execute(text(f'ALTER TABLE {BREADTH_TABLE} ADD COLUMN {guard}"{name}" {sql_type}'))
+
+def write_breadth(engine, timestamp, stats):
+    """Appends one breadth row, upgrading an older table first."""
+    key = str(engine.url)
+    if key not in _upgraded:
+        upgrade_breadth_table(engine)
+        _upgraded.add(key)
+    breadth_frame(timestamp, stats).to_sql(BREADTH_TABLE, con=engine, if_exists='append', index=False)
+
+def symbol_breadth(symbols, scores, benchmark=BENCHMARK):
+    """Per-symbol Z-Score and score relative to the benchmark ('vs BTC'), indexed by symbol."""
+    scores = np.asarray(scores, dtype=np.float64)
+    std = scores.std() if len(scores) else 0.0
+    zscores = (scores - scores.mean()) / std if std > 0 else np.zeros_like(scores)
+    symbols = list(symbols)
+    relative = scores - scores[symbols.index(benchmark)] if benchmark in symbols else np.full_like(scores, np.nan)
+    return pd.DataFrame({"Z-Score": zscores.round(2), "vs BTC": relative.round(2)}, index=symbols)
@@ -0,0 +1,153 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import datetime
+from tradingview_ta import Analysis
+from maverick_scheduler import DEFAULT_STALENESS, INTERVAL_SECONDS, candle_start
+
+# Shared by every process on the host unless MAVERICK_CACHE_PATH points elsewhere
+DEFAULT_CACHE_PATH = os.environ.get("MAVERICK_CACHE_PATH", "maverick_cache.sqlite")
+# A cached cell stays fresh as long as the collector's scheduler would reuse it, and never past
+# the close of the candle it was computed in (see AnalysisCache.expires_at)
+DEFAULT_TTL = DEFAULT_STALENESS
+# TTL in seconds for intervals missing from a TTL dict
+FALLBACK_TTL = 300
+
+def serialize_analysis(analysis):
+    """Packs an Analysis into zlib-compressed compact JSON."""
+    payload = {
+        "exchange": analysis.exchange,
+        "screener": analysis.screener,
+        "symbol": analysis.symbol,
+        "interval": analysis.interval,
+        "time": analysis.time.isoformat() if isinstance(analysis.time, datetime) else analysis.time,
+        "summary": analysis.summary,
+        "oscillators": analysis.oscillators,
+        "moving_averages": analysis.moving_averages,
+        "indicators": analysis.indicators
+    }
+    return zlib.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+
+def deserialize_analysis(blob):
+    """Rebuilds an Analysis from serialize_analysis output."""
+    payload = json.loads(zlib.decompress(blob).decode("utf-8"))
+    analysis = Analysis()
+    for field, value in payload.items():
+        setattr(analysis, field, value)
+    if analysis.time:
+        analysis.time = datetime.fromisoformat(analysis.time)
+    return analysis
+
+class AnalysisCache:
+    """On-disk TTL cache of analyses keyed by (exchange, screener, symbol, interval).
+
+    Backed by SQLite in WAL mode so the collector, the dashboards and the webhook can share
+    one file across processes and restarts. ttl is either seconds or a dict of seconds per interval.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS analysis_cache (
+                    exchange TEXT NOT NULL,
+                    screener TEXT NOT NULL,
+                    symbol TEXT NOT NULL,
+                    interval TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    payload BLOB NOT NULL,
+                    PRIMARY KEY (exchange, screener, symbol, interval)
+                )
+            """)
+
+    def _connect(self):
+        # sqlite3 connections can't be shared between threads, Streamlit runs one per session
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def ttl_for(self, interval):
+        if isinstance(self.ttl, dict):
+            return self.ttl.get(interval, FALLBACK_TTL)
+        return self.ttl
+
+    def expires_at(self, interval, analysis, now):
+        """Expiry of an analysis stored at now: its TTL, capped at the close of its candle.
+
+        An analysis from a candle that already closed is stored expired, so it is only ever
+        served as a stale fallback.
+        """
+        expires = now + self.ttl_for(interval)
+        length = INTERVAL_SECONDS.get(interval)
+        if length is not None:
+            produced = analysis.time.timestamp() if isinstance(analysis.time, datetime) else now
+            expires = min(expires, candle_start(interval, min(produced, now)) + length)
+        return expires
+
+    def _count(self, hits, misses):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def get(self, exchange, screener, symbol, interval, allow_expired=False):
+        """Returns the cached analysis or None. Expired entries are only returned with allow_expired."""
+        return self.get_many(exchange, screener, [(symbol, interval)], allow_expired).get((symbol, interval))
+
+    def get_many(self, exchange, screener, cells, allow_expired=False):
+        """Returns {(symbol, interval): analysis} for the requested cells found in the cache."""
+        cells = list(cells)
+        now = time.time()
+        found = {}
+        conn = self._connect()
+        for symbol, interval in cells:
+            row = conn.execute(
+                "SELECT expires_at, payload FROM analysis_cache "
+                "WHERE exchange = ? AND screener = ? AND symbol = ? AND interval = ?",
+                (exchange, screener, symbol, interval)
+            ).fetchone()
+            if row is not None and (allow_expired or row[0] > now):
+                found[(symbol, interval)] = deserialize_analysis(row[1])
+        self._count(len(found), len(cells) - len(found))
+        return found
+
+    def set(self, exchange, screener, symbol, interval, analysis):
+        self.set_many(exchange, screener, {(symbol, interval): analysis})
+
+    def set_many(self, exchange, screener, results):
+        """Stores every non-None analysis in results, keyed by (symbol, interval)."""
+        now = time.time()
+        rows = [
+            (exchange, screener, symbol, interval, self.expires_at(interval, analysis, now), serialize_analysis(analysis))
+            for (symbol, interval), analysis in results.items()
+            if analysis is not None
+        ]
+        with self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO analysis_cache VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    def purge_expired(self, grace=0):
+        """Deletes entries that expired more than grace seconds ago and returns how many were removed."""
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM analysis_cache WHERE expires_at <= ?", (time.time() - grace,)).rowcount
+
+    def stats(self):
+        """Hit/miss counts of this process plus the number of entries on disk."""
+        entries = self._connect().execute("SELECT COUNT(*) FROM analysis_cache").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries
+        }
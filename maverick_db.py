@@ -0,0 +1,148 @@
+import csv
+import io
+from datetime import datetime, timezone, timedelta
+import pandas as pd
+from sqlalchemy import MetaData, Table, inspect, text
+from maverick_history import DEFAULT_WINDOW, ScoreRingBuffer
+
+class BulkWriter:
+    """Appends DataFrames to a table in one round trip.
+
+    On PostgreSQL through psycopg2 the rows are streamed with COPY FROM STDIN from an in-memory
+    CSV buffer; on SQLite (local runs) they go straight to the driver's executemany, and any
+    other database gets a single multi-row SQLAlchemy INSERT.
+    Missing tables are created from the first frame, with the same column types to_sql would use.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        if engine.dialect.name == "postgresql" and engine.dialect.driver == "psycopg2":
+            self.method = "copy"
+        elif engine.dialect.name == "sqlite":
+            self.method = "executemany"
+        else:
+            self.method = "insert"
+        self._tables = {}
+
+    def _table(self, df, name, connection):
+        table = self._tables.get(name)
+        if table is None:
+            if not inspect(connection).has_table(name):
+                df.head(0).to_sql(name, con=connection, index=False)
+            table = Table(name, MetaData(), autoload_with=connection)
+            self._tables[name] = table
+        return table
+
+    def write(self, df, name, connection=None):
+        """Appends df to table name; returns the number of rows written.
+
+        With a connection the rows go into its transaction, committed or rolled back by the caller;
+        otherwise every write is a transaction of its own.
+        """
+        if df.empty:
+            return 0
+        if connection is None:
+            with self.engine.begin() as connection:
+                return self.write(df, name, connection)
+        table = self._table(df, name, connection)
+        if self.method == "copy":
+            self._copy(df, table, connection)
+        elif self.method == "executemany":
+            self._executemany(df, table, connection)
+        else:
+            records = df.astype(object).where(df.notna(), None).to_dict('records')
+            connection.execute(table.insert(), records)
+        return len(df)
+
+    def _copy(self, df, table, connection):
+        buffer = io.StringIO()
+        # Unquoted empty fields are NULL in COPY's CSV format; timestamps keep their UTC offset
+        df.to_csv(buffer, index=False, header=False, na_rep='', quoting=csv.QUOTE_MINIMAL)
+        buffer.seek(0)
+        columns = ", ".join(f'"{column}"' for column in df.columns)
+        # The driver connection under the SQLAlchemy one, inside its open transaction
+        with connection.connection.dbapi_connection.cursor() as cursor:
+            cursor.copy_expert(f'COPY "{table.name}" ({columns}) FROM STDIN WITH (FORMAT csv)', buffer)
+
+    def _executemany(self, df, table, connection):
+        columns = {}
+        for column, values in df.items():
+            if pd.api.types.is_datetime64_any_dtype(values):
+                # Same naive UTC text SQLAlchemy stores SQLite DateTime columns as
+                if values.dt.tz is not None:
+                    values = values.dt.tz_convert('UTC').dt.tz_localize(None)
+                values = values.dt.strftime('%Y-%m-%d %H:%M:%S.%f')
+            columns[column] = values.astype(object).where(values.notna(), None)
+        names = ", ".join(f'"{column}"' for column in df.columns)
+        placeholders = ", ".join("?" for _ in df.columns)
+        connection.exec_driver_sql(f'INSERT INTO "{table.name}" ({names}) VALUES ({placeholders})',
+                                   list(zip(*columns.values())))
+
+# Seconds a snapshot may be committed after its Timestamp: the collector stamps a cycle before
+# fetching and writes it afterwards, while the dashboards may write snapshots in between
+DEFAULT_LAG = 300
+
+class HistoryReader:
+    """Keeps a ScoreRingBuffer in step with momentum_scores by reading only rows past a watermark.
+
+    The first refresh reads the last window seconds; every later one reads the rows with a
+    Timestamp after the newest one seen so far minus lag, usually a single snapshot plus the
+    overlap. Rows already read are skipped by (Timestamp, Symbol); a snapshot committed late, with
+    a Timestamp before the newest one in the ring, rewinds the ring to it and the overlap is
+    appended again in order. Rows older than the window fall out of the ring's views and are
+    overwritten as it wraps.
+    """
+
+    def __init__(self, engine, symbols=(), window=DEFAULT_WINDOW, table='momentum_scores', lag=DEFAULT_LAG):
+        self.engine = engine
+        self.table = table
+        self.window = window
+        self.lag = lag
+        self.history = ScoreRingBuffer(symbols, window=window)
+        # Newest Timestamp read, exactly as stored, so the query compares like with like
+        self.watermark = None
+        # Rows read within lag of the watermark, UTC, to skip and replay them
+        self._recent = None
+
+    def refresh(self):
+        """Appends the rows written since the last refresh to history; returns how many were read."""
+        history = self.history
+        if self.watermark is None:
+            condition, since = '"Timestamp" >= :since', datetime.now(timezone.utc) - timedelta(seconds=self.window)
+            # The collector stores naive UTC timestamps
+            since = since.replace(tzinfo=None)
+            # Hydrate a fresh ring, so a failed first read leaves nothing half-loaded behind
+            history = ScoreRingBuffer(self.history.symbols, window=self.window)
+        else:
+            condition, since = '"Timestamp" > :since', self.watermark - timedelta(seconds=self.lag)
+        query = text(f'SELECT * FROM {self.table} WHERE {condition} ORDER BY "Timestamp"')
+        df = pd.read_sql(query, con=self.engine, params={"since": since}, parse_dates=['Timestamp'])
+        if df.empty:
+            return 0
+        watermark = df['Timestamp'].max()
+        if df['Timestamp'].dt.tz is None:
+            df['Timestamp'] = df['Timestamp'].dt.tz_localize('UTC')
+        else:
+            df['Timestamp'] = df['Timestamp'].dt.tz_convert('UTC')
+        recent = df
+        if self._recent is not None:
+            seen = pd.MultiIndex.from_frame(self._recent[['Timestamp', 'Symbol']])
+            df = df[~pd.MultiIndex.from_frame(df[['Timestamp', 'Symbol']]).isin(seen)]
+            if df.empty:
+                return 0
+            recent = pd.concat([self._recent, df], ignore_index=True)
+
+        rows = df
+        first = int(df['Timestamp'].min().timestamp())
+        latest = history.latest_timestamp
+        if latest is not None and first < latest:
+            history.rewind(first)
+            rows = recent[recent['Timestamp'] >= pd.Timestamp(first, unit='s', tz='UTC')]
+        history.extend(rows)
+
+        self.history = history
+        if self.watermark is None or watermark > pd.Timestamp(self.watermark):
+            self.watermark = watermark.to_pydatetime()
+        newest = recent['Timestamp'].max()
+        self._recent = recent[recent['Timestamp'] > newest - pd.Timedelta(seconds=self.lag)]
+        return len(df)
@@ -0,0 +1,125 @@
+import logging
+import requests
+from tradingview_ta import TradingView, __version__
+from tradingview_ta.main import calculate
+from maverick_singleflight import SingleFlight
+
+# Number of tickers sent to TradingView's scanner in a single request
+DEFAULT_BATCH_SIZE = 100
+# Seconds a single scanner request may take before its cells are given up on
+DEFAULT_TIMEOUT = 15
+
+# Shared by every Streamlit session of the process, which all import this module once. A leader
+# may also spend time in the rate limiter, so followers give it a few request timeouts
+flights = SingleFlight(max_wait=4 * DEFAULT_TIMEOUT)
+
+class ScannerError(Exception):
+    """Raised when TradingView's scanner answers with anything other than HTTP 200."""
+
+    def __init__(self, status_code):
+        super().__init__(f"Can't access TradingView's API. HTTP status code: {status_code}.")
+        self.status_code = status_code
+
+def chunk_symbols(symbols, batch_size=DEFAULT_BATCH_SIZE):
+    """Splits the symbol list into consecutive batches of at most batch_size symbols."""
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+    return [symbols[i:i + batch_size] for i in range(0, len(symbols), batch_size)]
+
+def fetch_interval_batch(symbols, exchange, screener, interval, timeout=DEFAULT_TIMEOUT):
+    """Fetches one interval for a batch of symbols with a single scanner request.
+
+    Same request as tradingview_ta.get_multiple_analysis, but a throttled or failed response
+    raises ScannerError with its status code instead of failing to parse as JSON.
+    """
+    tickers = [f"{exchange}:{symbol}".upper() for symbol in symbols]
+    indicators_key = TradingView.indicators.copy()
+    response = requests.post(
+        f"{TradingView.scan_url}{screener.lower()}/scan",
+        json=TradingView.data(tickers, interval, indicators_key),
+        headers={"User-Agent": f"tradingview_ta/{__version__}"},
+        timeout=timeout
+    )
+    if response.status_code != 200:
+        raise ScannerError(response.status_code)
+
+    analyses = {}
+    for row in response.json()["data"]:
+        row_exchange, row_symbol = row["s"].split(":")
+        analyses[row["s"]] = calculate(indicators=dict(zip(indicators_key, row["d"])), indicators_key=indicators_key,
+                                       screener=screener, symbol=row_symbol, exchange=row_exchange, interval=interval)
+    return {symbol: analyses.get(ticker) for symbol, ticker in zip(symbols, tickers)}
+
+def _fetch_batch(symbols, exchange, screener, interval, timeout, limiter, quarantine):
+    if limiter is None:
+        analyses = fetch_interval_batch(symbols, exchange, screener, interval, timeout)
+    else:
+        analyses = limiter.call(exchange, screener, fetch_interval_batch, symbols, exchange, screener, interval, timeout)
+    if quarantine is not None:
+        quarantine.observe(exchange, screener, analyses)
+    return analyses
+
+def request_batch(symbols, exchange, screener, interval, timeout=DEFAULT_TIMEOUT, limiter=None, quarantine=None):
+    """fetch_interval_batch, routed through a RateLimiter when one is given.
+
+    Concurrent callers asking for the same batch wait on a single in-flight request and share its result.
+    A successful response is reported once to the SymbolQuarantine, if any.
+    """
+    key = (exchange, screener, interval, tuple(symbols))
+    return flights.do(key, _fetch_batch, symbols, exchange, screener, interval, timeout, limiter, quarantine)
+
+def fill_stale(data, exchange, screener, cache, quarantine=None):
+    """Replaces failed (None) cells with expired cache entries so a throttled cycle still has values.
+
+    Cells of quarantined symbols stay None: the scanner dropped them, an old value would only hide that.
+    """
+    failed = [key for key, analysis in data.items() if analysis is None
+              and not (quarantine is not None and quarantine.is_quarantined(exchange, screener, key[0]))]
+    if failed:
+        data.update(cache.get_many(exchange, screener, failed, allow_expired=True))
+
+def split_cached(symbols_by_interval, exchange, screener, cache):
+    """Looks every requested cell up in cache.
+
+    Returns the cached cells and {interval: [symbols]} of the cells still to fetch.
+    """
+    cells = [(symbol, interval) for interval, symbols in symbols_by_interval.items() for symbol in symbols]
+    cached = cache.get_many(exchange, screener, cells)
+    missing = {}
+    for symbol, interval in cells:
+        if (symbol, interval) not in cached:
+            missing.setdefault(interval, []).append(symbol)
+    return cached, missing
+
+def fetch_multiple_data(symbols, exchange, screener, intervals, batch_size=DEFAULT_BATCH_SIZE, timeout=DEFAULT_TIMEOUT,
+                        cache=None, limiter=None, quarantine=None):
+    """Fetches every (symbol, interval) pair using one scanner request per interval and batch.
+
+    Returns a dict keyed by (symbol, interval); pairs that could not be fetched map to None.
+    With an AnalysisCache only cells missing from it are requested, fresh results are stored back
+    and failed cells fall back to expired entries. With a RateLimiter every request goes through it.
+    With a SymbolQuarantine, quarantined symbols are not requested until their recheck and map to None.
+    """
+    symbols_by_interval = {interval: list(symbols) for interval in intervals}
+    data = {}
+    if cache is not None:
+        data, symbols_by_interval = split_cached(symbols_by_interval, exchange, screener, cache)
+    if quarantine is not None:
+        symbols_by_interval, skipped = quarantine.split(exchange, screener, symbols_by_interval)
+        data.update(dict.fromkeys(skipped))
+    fetched = {}
+    for interval, interval_symbols in symbols_by_interval.items():
+        for batch in chunk_symbols(interval_symbols, batch_size):
+            try:
+                analyses = request_batch(batch, exchange, screener, interval, timeout, limiter, quarantine)
+            except Exception as e:
+                logging.error(f"Error fetching {len(batch)} symbols on {interval}: {str(e)}")
+                analyses = {}
+            for symbol in batch:
+                fetched[(symbol, interval)] = analyses.get(symbol)
+    if cache is not None:
+        cache.set_many(exchange, screener, fetched)
+    data.update(fetched)
+    if cache is not None:
+        fill_stale(data, exchange, screener, cache, quarantine)
+    return data
@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+from maverick_regime import NEUTRAL, RegimeClassifier
+
+# Snapshots kept: 24 hours at up to two snapshots a minute (collector and dashboard both write)
+DEFAULT_CAPACITY = 24 * 60 * 2
+# Span (seconds) the views cover, counted back from the newest snapshot
+DEFAULT_WINDOW = 24 * 60 * 60
+
+class ScoreRingBuffer:
+    """Fixed-size history of momentum score snapshots: timestamps x symbols float32, NaN where absent.
+
+    Rows are written round-robin, the oldest snapshot being overwritten once capacity is reached.
+    Snapshots sharing a timestamp are merged into one row. Views only cover the last window
+    seconds and are ordered oldest first. Symbols not seen before get a new column. Every
+    snapshot's Average Momentum is classified into a regime as it is appended.
+    """
+
+    def __init__(self, symbols=(), capacity=DEFAULT_CAPACITY, window=DEFAULT_WINDOW):
+        self.capacity = capacity
+        self.window = window
+        self.symbols = []
+        self.symbol_index = {}
+        self.timestamps = np.zeros(capacity, dtype=np.int64)
+        self.averages = np.full(capacity, np.nan, dtype=np.float32)
+        self.regimes = np.zeros(capacity, dtype=np.int8)
+        self.classifier = RegimeClassifier()
+        self._state_before_latest = self.classifier.state
+        self.scores = np.full((capacity, 0), np.nan, dtype=np.float32)
+        self.head = 0
+        self.size = 0
+        self._add_symbols(symbols)
+
+    def _add_symbols(self, symbols):
+        new = [symbol for symbol in dict.fromkeys(symbols) if symbol not in self.symbol_index]
+        if not new:
+            return
+        for symbol in new:
+            self.symbol_index[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        self.scores = np.hstack([self.scores, np.full((self.capacity, len(new)), np.nan, dtype=np.float32)])
+
+    @property
+    def latest_timestamp(self):
+        """Epoch seconds of the newest snapshot, or None when empty."""
+        if not self.size:
+            return None
+        return int(self.timestamps[(self.head - 1) % self.capacity])
+
+    def append(self, timestamp, symbols, scores, average=None):
+        """Adds one snapshot; timestamp is a datetime or epoch seconds, scores aligned with symbols.
+
+        A snapshot older than the newest one is ignored. average defaults to the mean of scores.
+        """
+        if isinstance(timestamp, (int, np.integer)):
+            when = int(timestamp)
+        else:
+            when = int(pd.Timestamp(timestamp).timestamp())
+        latest = self.latest_timestamp
+        if latest is not None and when < latest:
+            return
+        self._add_symbols(symbols)
+        columns = [self.symbol_index[symbol] for symbol in symbols]
+        values = np.asarray(scores, dtype=np.float32)
+        if latest is not None and when == latest:
+            row = (self.head - 1) % self.capacity
+            # The merged snapshot is classified again from the state before its first part
+            self.classifier.state = self._state_before_latest
+        else:
+            self._state_before_latest = self.classifier.state
+            row = self.head
+            self.head = (self.head + 1) % self.capacity
+            self.size = min(self.size + 1, self.capacity)
+            self.timestamps[row] = when
+            self.scores[row] = np.nan
+        self.scores[row, columns] = values
+        if average is None:
+            present = self.scores[row][~np.isnan(self.scores[row])]
+            average = present.mean() if len(present) else np.nan
+        self.averages[row] = average
+        self.regimes[row] = self.classifier.update(float(average))
+
+    def rewind(self, timestamp):
+        """Drops the snapshots at or after timestamp (epoch seconds), so a late one can be appended in order.
+
+        Classification resumes from the regime of the snapshot that is newest afterwards.
+        """
+        while self.size and self.latest_timestamp >= timestamp:
+            self.head = (self.head - 1) % self.capacity
+            self.size -= 1
+        self.classifier.state = int(self.regimes[(self.head - 1) % self.capacity]) if self.size else NEUTRAL
+        self._state_before_latest = int(self.regimes[(self.head - 2) % self.capacity]) if self.size > 1 else NEUTRAL
+
+    def extend(self, df):
+        """Appends momentum_scores rows (Symbol, Momentum Score, Timestamp[, Average Momentum]) in time order."""
+        if df.empty:
+            return
+        df = df.sort_values('Timestamp', kind='stable')
+        for timestamp, group in df.groupby('Timestamp', sort=False):
+            average = group['Average Momentum'].iloc[-1] if 'Average Momentum' in group else None
+            self.append(timestamp, group['Symbol'].tolist(), group['Momentum Score'].to_numpy(), average)
+
+    def _rows(self):
+        """Ring positions of the snapshots inside the window, oldest first."""
+        order = (self.head - self.size + np.arange(self.size)) % self.capacity
+        if self.size:
+            order = order[self.timestamps[order] > self.latest_timestamp - self.window]
+        return order
+
+    def times(self):
+        """UTC DatetimeIndex of the snapshots in the window."""
+        return pd.to_datetime(self.timestamps[self._rows()], unit='s', utc=True)
+
+    def average_series(self):
+        """Average Momentum per snapshot in the window."""
+        return pd.Series(self.averages[self._rows()], index=self.times(), name='Average Momentum')
+
+    def regime_series(self):
+        """Regime code (maverick_regime BULL/NEUTRAL/BEAR) per snapshot in the window."""
+        return pd.Series(self.regimes[self._rows()], index=self.times(), name='Regime')
+
+    @property
+    def latest_regime(self):
+        return self.classifier.state
+
+    def series(self, symbol):
+        """Momentum Score of one symbol over the window, snapshots without it left out."""
+        rows = self._rows()
+        if symbol not in self.symbol_index:
+            return pd.Series(dtype=np.float32, name=symbol)
+        values = self.scores[rows, self.symbol_index[symbol]]
+        present = ~np.isnan(values)
+        return pd.Series(values[present], index=self.times()[present], name=symbol)
+
+    def latest(self):
+        """(timestamp, {symbol: score}) of the newest snapshot, or (None, {}) when empty."""
+        if not self.size:
+            return None, {}
+        row = self.scores[(self.head - 1) % self.capacity]
+        present = np.flatnonzero(~np.isnan(row))
+        return (pd.Timestamp(self.latest_timestamp, unit='s', tz='UTC'),
+                {self.symbols[i]: float(row[i]) for i in present})
+
+    def first_scores(self):
+        """{symbol: score} of each symbol's oldest snapshot in the window, the reference for Change."""
+        view = self.scores[self._rows()]
+        if not len(view):
+            return {}
+        present = ~np.isnan(view)
+        first = present.argmax(axis=0)
+        values = view[first, np.arange(view.shape[1])]
+        return {self.symbols[i]: float(values[i]) for i in np.flatnonzero(present.any(axis=0))}
+
+    @property
+    def nbytes(self):
+        return self.timestamps.nbytes + self.averages.nbytes + self.regimes.nbytes + self.scores.nbytes
@@ -0,0 +1,139 @@
+import argparse
+import glob
+import os
+import uuid
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+# Directory of date=YYYY-MM-DD partitions, shared by every app writing history
+DEFAULT_ARCHIVE_PATH = os.environ.get("MAVERICK_ARCHIVE_PATH", "momentum_archive")
+
+COLUMNS = ['Symbol', 'Momentum Score', 'Timestamp', 'Average Momentum']
+# Symbols are dictionary encoded: every file stores the names once and an int16 index per row
+SCHEMA = pa.schema([
+    ("Symbol", pa.dictionary(pa.int16(), pa.string())),
+    ("Momentum Score", pa.float64()),
+    ("Timestamp", pa.timestamp("us", tz="UTC")),
+    ("Average Momentum", pa.float64()),
+    ("date", pa.date32())
+])
+PARTITIONING = ds.partitioning(pa.schema([("date", pa.date32())]), flavor="hive")
+
+# History CSVs the importer picks up by default
+DEFAULT_CSVS = ["historical_momentum_scores.csv", "momentum_data/historical_momentum_scores.csv",
+                "momentum_data/momentum_scores_*.csv"]
+# marybotv1 result columns and their momentum_scores names
+MARYBOT_COLUMNS = {"Fecha": "Timestamp", "Promedio Total de Puntuaciones de Momentum": "Average Momentum"}
+
+def _utc(timestamps):
+    timestamps = pd.to_datetime(timestamps)
+    return timestamps.dt.tz_localize('UTC') if timestamps.dt.tz is None else timestamps.dt.tz_convert('UTC')
+
+def _local_to_utc(timestamps):
+    """Naive local-time timestamps, as marybotv1 wrote Fecha, in UTC.
+
+    datetime.astimezone() applies the host's offset in effect at each timestamp, DST included.
+    """
+    timestamps = pd.to_datetime(timestamps)
+    utc = {timestamp: pd.Timestamp(timestamp.to_pydatetime().astimezone()).tz_convert('UTC')
+           for timestamp in timestamps.dropna().unique()}
+    return timestamps.map(utc).astype('datetime64[ns, UTC]')
+
+class ParquetArchive:
+    """Momentum score history as Parquet files partitioned by UTC date.
+
+    Every write adds new files to the date partitions it touches; reads prune partitions by
+    date and push the Symbol and Timestamp filters down to the row groups, so a symbol or time
+    range query never parses the rest of the history. Naive timestamps are taken to be UTC.
+    """
+
+    def __init__(self, path=DEFAULT_ARCHIVE_PATH):
+        self.path = path
+
+    def write(self, df):
+        """Appends momentum_scores rows (Symbol, Momentum Score, Timestamp, Average Momentum); returns rows written."""
+        if df.empty:
+            return 0
+        df = df[COLUMNS].copy()
+        df['Timestamp'] = _utc(df['Timestamp'])
+        df['date'] = df['Timestamp'].dt.date
+        table = pa.Table.from_pandas(df, schema=SCHEMA, preserve_index=False)
+        ds.write_dataset(table, self.path, format="parquet", partitioning=PARTITIONING,
+                         basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+                         existing_data_behavior="overwrite_or_ignore")
+        return len(df)
+
+    def read(self, symbols=None, start=None, end=None, columns=COLUMNS):
+        """Rows of the given symbols between start and end (inclusive, any may be None), oldest first.
+
+        Symbol comes back as a pandas categorical, Timestamp as UTC.
+        """
+        if not os.path.isdir(self.path):
+            return pd.DataFrame(columns=columns)
+        conditions = []
+        if start is not None:
+            start = pd.Timestamp(start)
+            start = start.tz_localize('UTC') if start.tzinfo is None else start.tz_convert('UTC')
+            conditions += [ds.field("date") >= start.date(), ds.field("Timestamp") >= start]
+        if end is not None:
+            end = pd.Timestamp(end)
+            end = end.tz_localize('UTC') if end.tzinfo is None else end.tz_convert('UTC')
+            conditions += [ds.field("date") <= end.date(), ds.field("Timestamp") <= end]
+        if symbols is not None:
+            conditions.append(ds.field("Symbol").isin(list(symbols)))
+        condition = None
+        for part in conditions:
+            condition = part if condition is None else condition & part
+        dataset = ds.dataset(self.path, format="parquet", schema=SCHEMA, partitioning=PARTITIONING)
+        df = dataset.to_table(columns=list(columns), filter=condition).to_pandas()
+        if 'Timestamp' in df:
+            df = df.sort_values('Timestamp', kind='stable', ignore_index=True)
+        return df
+
+def read_history_csv(path):
+    """momentum_scores rows of a history CSV, either momentum_scores shaped or a marybotv1 results file.
+
+    Timestamp comes back in UTC: marybotv1's Fecha is local time, momentum_scores' naive UTC.
+    """
+    df = pd.read_csv(path)
+    local = 'Fecha' in df.columns
+    df = df.rename(columns=MARYBOT_COLUMNS)
+    missing = [column for column in COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"{path} has no {', '.join(missing)} column")
+    df = df[COLUMNS].copy()
+    df['Timestamp'] = _local_to_utc(df['Timestamp']) if local else _utc(df['Timestamp'])
+    return df
+
+def import_csvs(archive, paths):
+    """Archives the rows of every CSV, skipping duplicates and snapshots already in the archive; returns rows added."""
+    if not paths:
+        return 0
+    df = pd.concat([read_history_csv(path) for path in paths], ignore_index=True)
+    df['Timestamp'] = _utc(df['Timestamp'])
+    df = df.drop_duplicates(['Timestamp', 'Symbol'], keep='last')
+    if df.empty:
+        return 0
+    archived = archive.read(start=df['Timestamp'].min(), end=df['Timestamp'].max(), columns=['Timestamp'])
+    if not archived.empty:
+        df = df[~df['Timestamp'].dt.as_unit('us').isin(archived['Timestamp'].dt.as_unit('us'))]
+    return archive.write(df)
+
+def main():
+    parser = argparse.ArgumentParser(description="Import momentum history CSVs into the Parquet archive")
+    parser.add_argument("csvs", nargs="*", help=f"CSV files or globs (default: {' '.join(DEFAULT_CSVS)})")
+    parser.add_argument("--archive", default=DEFAULT_ARCHIVE_PATH)
+    args = parser.parse_args()
+
+    paths = sorted({path for pattern in (args.csvs or DEFAULT_CSVS) for path in glob.glob(pattern)})
+    archive = ParquetArchive(args.archive)
+    added = import_csvs(archive, paths)
+    csv_bytes = sum(os.path.getsize(path) for path in paths)
+    parquet_bytes = sum(os.path.getsize(os.path.join(root, name))
+                        for root, _, names in os.walk(args.archive) for name in names)
+    print(f"Imported {added} rows from {len(paths)} CSVs ({csv_bytes:,} bytes) into {args.archive} "
+          f"({parquet_bytes:,} bytes)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import logging
+import threading
+import time
+
+# Consecutive responses without a row for a symbol before it is quarantined
+DEFAULT_THRESHOLD = 3
+# Seconds until the first recheck of a quarantined symbol; doubles after every failed recheck
+DEFAULT_RECHECK = 600
+DEFAULT_MAX_RECHECK = 6 * 60 * 60
+# Misses of a symbol less than this many seconds after its last counted one belong to the same
+# collector cycle (other intervals, retries) and don't count again
+DEFAULT_MISS_WINDOW = 50
+
+class SymbolQuarantine:
+    """Stops requesting symbols the scanner no longer knows, rechecking them on an exponential schedule.
+
+    Only a symbol missing from a successful scanner response counts against it; throttled, failed
+    or timed out requests say nothing about the symbol, and a symbol counts at most one miss per
+    miss_window seconds however many intervals miss it. Any analysis for it releases it again.
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, recheck=DEFAULT_RECHECK, max_recheck=DEFAULT_MAX_RECHECK,
+                 miss_window=DEFAULT_MISS_WINDOW):
+        self.threshold = threshold
+        self.recheck = recheck
+        self.max_recheck = max_recheck
+        self.miss_window = miss_window
+        # (exchange, screener, symbol) -> {"misses", "last_miss", "delay", "next_check", "since"}
+        self.entries = {}
+        self._lock = threading.Lock()
+
+    def _quarantined(self, entry):
+        return entry is not None and entry["next_check"] is not None
+
+    def is_quarantined(self, exchange, screener, symbol):
+        """True while the symbol is quarantined, recheck due or not."""
+        with self._lock:
+            return self._quarantined(self.entries.get((exchange, screener, symbol)))
+
+    def is_skipped(self, exchange, screener, symbol, now=None):
+        """True while a quarantined symbol waits for its next recheck."""
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self.entries.get((exchange, screener, symbol))
+            return self._quarantined(entry) and now < entry["next_check"]
+
+    def split(self, exchange, screener, symbols_by_interval, now=None):
+        """Drops skipped symbols from {interval: [symbols]}.
+
+        Returns the symbols to request per interval and the list of skipped (symbol, interval) cells.
+        """
+        now = time.time() if now is None else now
+        active = {}
+        skipped = []
+        for interval, symbols in symbols_by_interval.items():
+            for symbol in symbols:
+                if self.is_skipped(exchange, screener, symbol, now):
+                    skipped.append((symbol, interval))
+                else:
+                    active.setdefault(interval, []).append(symbol)
+        return active, skipped
+
+    def observe(self, exchange, screener, analyses, now=None):
+        """Records one successful scanner response, {symbol: analysis or None}."""
+        now = time.time() if now is None else now
+        with self._lock:
+            for symbol, analysis in analyses.items():
+                key = (exchange, screener, symbol)
+                entry = self.entries.get(key)
+                if analysis is not None:
+                    if self._quarantined(entry):
+                        logging.info(f"{exchange}:{symbol} is back, released from quarantine")
+                    self.entries.pop(key, None)
+                    continue
+                if entry is None:
+                    entry = self.entries[key] = {"misses": 0, "last_miss": None, "delay": None, "next_check": None,
+                                                 "since": None}
+                if not self._quarantined(entry):
+                    if entry["last_miss"] is not None and now - entry["last_miss"] < self.miss_window:
+                        continue
+                    entry["misses"] += 1
+                    entry["last_miss"] = now
+                    if entry["misses"] >= self.threshold:
+                        entry["delay"] = self.recheck
+                        entry["next_check"] = now + entry["delay"]
+                        entry["since"] = now
+                        logging.warning(f"{exchange}:{symbol} missing from scanner responses in {entry['misses']} cycles, "
+                                        f"quarantined for {entry['delay']}s")
+                elif now >= entry["next_check"]:
+                    entry["misses"] += 1
+                    # Failed recheck; the other intervals of the same recheck find next_check in the future
+                    entry["delay"] = min(entry["delay"] * 2, self.max_recheck)
+                    entry["next_check"] = now + entry["delay"]
+
+    def report(self, now=None):
+        """Quarantined symbols as a list of dicts, the longest quarantined first."""
+        now = time.time() if now is None else now
+        with self._lock:
+            rows = [
+                {
+                    "Exchange": exchange,
+                    "Symbol": symbol,
+                    "Misses": entry["misses"],
+                    "Quarantined For (min)": round((now - entry["since"]) / 60, 1),
+                    "Next Check (min)": round(max(0, entry["next_check"] - now) / 60, 1)
+                }
+                for (exchange, screener, symbol), entry in self.entries.items() if self._quarantined(entry)
+            ]
+        return sorted(rows, key=lambda row: row["Quarantined For (min)"], reverse=True)
+
+    def symbols(self, exchange=None):
+        """Names of the quarantined symbols, optionally for one exchange."""
+        with self._lock:
+            return sorted(symbol for (entry_exchange, screener, symbol), entry in self.entries.items()
+                          if self._quarantined(entry) and exchange in (None, entry_exchange))
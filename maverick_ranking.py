@@ -0,0 +1,86 @@
+import bisect
+import pandas as pd
+
+# Symbols shown per long/short panel
+DEFAULT_TOP_N = 20
+
+class TopNTracker:
+    """Keeps every symbol ordered by score so the long/short panels are read off the ends.
+
+    Scores live in a sorted list of (score, symbol): a changed score costs two binary searches
+    plus a list shift, and serving the top or bottom n costs O(n). Change is measured against
+    a reference score per symbol (set_reference), 0 for symbols without one.
+    """
+
+    def __init__(self, n=DEFAULT_TOP_N):
+        self.n = n
+        self.scores = {}
+        self.reference = {}
+        self._ranked = []
+
+    def __len__(self):
+        return len(self._ranked)
+
+    def update(self, symbol, score):
+        """Sets one symbol's score; returns False if it was unchanged."""
+        previous = self.scores.get(symbol)
+        if previous == score:
+            return False
+        if previous is not None:
+            del self._ranked[bisect.bisect_left(self._ranked, (previous, symbol))]
+        self.scores[symbol] = score
+        bisect.insort(self._ranked, (score, symbol))
+        return True
+
+    def remove(self, symbol):
+        previous = self.scores.pop(symbol, None)
+        if previous is not None:
+            del self._ranked[bisect.bisect_left(self._ranked, (previous, symbol))]
+
+    def sync(self, scores):
+        """Makes the tracked scores equal to a {symbol: score} snapshot, touching only what differs.
+
+        Returns the number of symbols added, moved or removed.
+        """
+        changed = sum(self.update(symbol, float(score)) for symbol, score in scores.items())
+        missing = [symbol for symbol in self.scores if symbol not in scores]
+        for symbol in missing:
+            self.remove(symbol)
+        return changed + len(missing)
+
+    def set_reference(self, reference):
+        """{symbol: score} the Change column is measured against."""
+        self.reference = reference
+
+    def _rows(self, entries):
+        return [(symbol, score, self.reference.get(symbol)) for score, symbol in entries]
+
+    def top(self, n=None):
+        """[(symbol, score, reference or None)] of the n highest scores, best first."""
+        n = self.n if n is None else n
+        return self._rows(reversed(self._ranked[-n:] if n else []))
+
+    def bottom(self, n=None):
+        """[(symbol, score, reference or None)] of the n lowest scores, worst first."""
+        n = self.n if n is None else n
+        return self._rows(self._ranked[:n])
+
+    def rank(self, symbol):
+        """1-based position of symbol from the top, or None if untracked."""
+        score = self.scores.get(symbol)
+        if score is None:
+            return None
+        return len(self._ranked) - bisect.bisect_left(self._ranked, (score, symbol))
+
+    @staticmethod
+    def frame(rows):
+        """Panel DataFrame (Symbol, Momentum Score, Previous Score, Change) of top()/bottom() rows."""
+        df = pd.DataFrame(rows, columns=['Symbol', 'Momentum Score', 'Previous Score'])
+        df['Previous Score'] = df['Previous Score'].astype(float)
+        df['Change'] = (df['Momentum Score'] - df['Previous Score'].fillna(0)).round(2)
+        df['Momentum Score'] = df['Momentum Score'].round(2)
+        return df
+
+    def panels(self, n=None):
+        """(long_df, short_df) for the top and bottom n symbols."""
+        return self.frame(self.top(n)), self.frame(self.bottom(n))
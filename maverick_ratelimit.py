@@ -0,0 +1,174 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+import requests
+from maverick_fetch import ScannerError
+
+# Requests per second allowed per (exchange, screener) and the burst on top of it
+DEFAULT_RATE = 2.0
+DEFAULT_BURST = 10
+# Retries of a single request after a throttled or failed attempt
+DEFAULT_MAX_RETRIES = 3
+# Consecutive throttled/failed attempts that open the circuit, and how long it stays open (seconds)
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 60
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling upstream while the circuit for an exchange is open."""
+
+def is_retryable(error):
+    """Throttling (429), server errors (5xx), timeouts and dropped connections are worth retrying."""
+    if isinstance(error, ScannerError):
+        return error.status_code == 429 or error.status_code >= 500
+    return isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError))
+
+class TokenBucket:
+    """Classic token bucket: rate tokens per second, holding at most burst tokens."""
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, block=True):
+        """Takes one token, sleeping until one is available unless block is False."""
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if not block:
+                return False
+            time.sleep(wait)
+
+class CircuitBreaker:
+    """Opens after failure_threshold consecutive failures and lets one probe through after reset_timeout."""
+
+    def __init__(self, failure_threshold=DEFAULT_FAILURE_THRESHOLD, reset_timeout=DEFAULT_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                return True
+            return self.state == CLOSED
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    logging.warning(f"Circuit opened after {self.failures} consecutive failures")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+class ExchangeLimiter:
+    """Token bucket, jittered exponential backoff and circuit breaker for one (exchange, screener)."""
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, max_retries=DEFAULT_MAX_RETRIES,
+                 backoff_base=1.0, backoff_cap=60.0, failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout=DEFAULT_RESET_TIMEOUT):
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.throttled = 0
+        self._sent = deque()
+        self._lock = threading.Lock()
+
+    def backoff_delay(self, attempt):
+        # "Full jitter": spreads retries of concurrent workers instead of having them collide again
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    def _record_sent(self):
+        now = time.monotonic()
+        with self._lock:
+            self._sent.append(now)
+            while self._sent and now - self._sent[0] > 60:
+                self._sent.popleft()
+
+    def call(self, fn, *args, **kwargs):
+        """Runs fn under the limits, retrying retryable errors. Raises CircuitOpenError while open."""
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                raise CircuitOpenError("Circuit open, upstream is being given time to recover")
+            self.bucket.acquire()
+            self._record_sent()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                if isinstance(e, ScannerError) and e.status_code == 429:
+                    self.throttled += 1
+                self.breaker.record_failure()
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff_delay(attempt)
+                logging.warning(f"Retrying in {delay:.1f}s after: {str(e)}")
+                time.sleep(delay)
+            else:
+                self.breaker.record_success()
+                return result
+
+    def status(self):
+        with self._lock:
+            sent_last_minute = len(self._sent)
+        return {
+            "rate_limit": self.bucket.rate,
+            "requests_per_second": sent_last_minute / 60,
+            "tokens": round(self.bucket.tokens, 2),
+            "state": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "throttled": self.throttled
+        }
+
+class RateLimiter:
+    """Registry of ExchangeLimiters, one per (exchange, screener), created on first use."""
+
+    def __init__(self, **limiter_options):
+        self.limiter_options = limiter_options
+        self.limiters = {}
+        self._lock = threading.Lock()
+
+    def get(self, exchange, screener):
+        with self._lock:
+            key = (exchange, screener)
+            if key not in self.limiters:
+                self.limiters[key] = ExchangeLimiter(**self.limiter_options)
+            return self.limiters[key]
+
+    def call(self, exchange, screener, fn, *args, **kwargs):
+        return self.get(exchange, screener).call(fn, *args, **kwargs)
+
+    def status(self):
+        """Current rate and circuit state per "EXCHANGE:screener"."""
+        with self._lock:
+            limiters = dict(self.limiters)
+        return {f"{exchange}:{screener}": limiter.status() for (exchange, screener), limiter in limiters.items()}
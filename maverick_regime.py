@@ -0,0 +1,76 @@
+import math
+import numpy as np
+import pandas as pd
+
+BEAR = -1
+NEUTRAL = 0
+BULL = 1
+REGIME_NAMES = {BULL: 'bull', NEUTRAL: 'neutral', BEAR: 'bear'}
+# Colours update_plot has always used for the three regimes
+REGIME_COLORS = {BULL: 'green', NEUTRAL: 'grey', BEAR: 'red'}
+
+# Average Momentum above DEFAULT_ENTER enters bull, and bull is only left again below DEFAULT_EXIT;
+# mirrored for bear
+DEFAULT_ENTER = 0.5
+DEFAULT_EXIT = 0.4
+
+class RegimeClassifier:
+    """Streaming bull/neutral/bear classification of Average Momentum with hysteresis.
+
+    The band between exit and enter keeps whatever regime was already in place, so the state
+    doesn't flicker while the average hovers around a threshold. Missing values keep the state.
+    """
+
+    def __init__(self, enter=DEFAULT_ENTER, exit=DEFAULT_EXIT, state=NEUTRAL):
+        if exit > enter:
+            raise ValueError("exit must not be above enter")
+        self.enter = enter
+        self.exit = exit
+        self.state = state
+
+    def update(self, value):
+        if value is None or math.isnan(value):
+            return self.state
+        if self.state == BULL and value < self.exit:
+            self.state = NEUTRAL
+        elif self.state == BEAR and value > -self.exit:
+            self.state = NEUTRAL
+        if self.state == NEUTRAL:
+            if value > self.enter:
+                self.state = BULL
+            elif value < -self.enter:
+                self.state = BEAR
+        return self.state
+
+    def classify(self, values):
+        """int8 regime of every value in order, continuing from the current state."""
+        return np.fromiter((self.update(float(value)) for value in values), dtype=np.int8, count=len(values))
+
+def run_lengths(timestamps, regimes):
+    """Run-length encoded regimes: one row per uninterrupted run with its Regime, Start, End and Snapshots."""
+    regimes = np.asarray(regimes)
+    if not len(regimes):
+        return pd.DataFrame(columns=['Regime', 'Start', 'End', 'Snapshots'])
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(regimes)) + 1])
+    ends = np.concatenate([starts[1:], [len(regimes)]])
+    timestamps = pd.Index(timestamps)
+    return pd.DataFrame({
+        'Regime': [REGIME_NAMES[int(regime)] for regime in regimes[starts]],
+        'Start': timestamps[starts],
+        'End': timestamps[ends - 1],
+        'Snapshots': ends - starts
+    })
+
+def regime_segments(series, regimes):
+    """(timestamps, values, colour) per regime run, for drawing a line coloured by regime.
+
+    Each run starts at the last point of the previous one so the line stays connected; the
+    segment leading into a point takes that point's regime.
+    """
+    regimes = np.asarray(regimes)
+    if len(regimes) < 2:
+        return []
+    starts = np.concatenate([[1], np.flatnonzero(np.diff(regimes[1:])) + 2])
+    ends = np.concatenate([starts[1:], [len(regimes)]])
+    return [(series.index[start - 1:end], series.values[start - 1:end], REGIME_COLORS[int(regimes[start])])
+            for start, end in zip(starts, ends)]
@@ -0,0 +1,182 @@
+import argparse
+import json
+import os
+import time
+import zlib
+import numpy as np
+import pandas as pd
+from sqlalchemy import BigInteger, Column, LargeBinary, MetaData, Table, Text, create_engine, inspect, text
+from sqlalchemy.exc import IntegrityError
+from maverick_store import MISSING
+from maverick_scoring import score_matrix
+
+# One row per snapshot: Timestamp, Universe and Codes, the symbols x intervals int8 rating matrix
+RATINGS_TABLE = 'rating_snapshots'
+# Symbol and interval order of every universe id used in RATINGS_TABLE
+UNIVERSE_TABLE = 'rating_universes'
+
+# Universe is the key so two writers can't both register a layout; tables from before it was added have none
+universes_table = Table(
+    UNIVERSE_TABLE, MetaData(),
+    Column("Universe", BigInteger, primary_key=True),
+    Column("Symbols", Text, nullable=False),
+    Column("Intervals", Text, nullable=False),
+)
+
+def universe_id(symbols, intervals):
+    """Stable id of a (symbols, intervals) layout, so writers agree on it without coordination."""
+    return zlib.crc32(json.dumps([list(symbols), list(intervals)]).encode("utf-8"))
+
+class RatingArchive:
+    """Raw per-interval recommendation codes of every snapshot, one int8 per cell, in the database.
+
+    Codes use maverick_store's encoding (STRONG_SELL -2 ... STRONG_BUY 2, MISSING for no analysis),
+    so any weighting can be applied to history later.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._universes = {}
+
+    def _ensure_universe(self, symbols, intervals):
+        universe = universe_id(symbols, intervals)
+        if universe in self._universes:
+            return universe
+        if not inspect(self.engine).has_table(UNIVERSE_TABLE):
+            universes_table.create(self.engine)
+        with self.engine.connect() as connection:
+            known = connection.execute(
+                text(f'SELECT 1 FROM {UNIVERSE_TABLE} WHERE "Universe" = :universe'), {"universe": universe}).first()
+        if known is None:
+            try:
+                with self.engine.begin() as connection:
+                    connection.execute(universes_table.insert(), {
+                        "Universe": universe,
+                        "Symbols": json.dumps(list(symbols)),
+                        "Intervals": json.dumps(list(intervals))
+                    })
+            except IntegrityError:
+                # Another writer registered the same layout in the meantime
+                pass
+        self._universes[universe] = (list(symbols), list(intervals))
+        return universe
+
+    def append(self, timestamp, symbols, intervals, codes):
+        """Archives one symbols x intervals int8 code matrix."""
+        codes = np.ascontiguousarray(codes, dtype=np.int8)
+        if codes.shape != (len(symbols), len(intervals)):
+            raise ValueError(f"codes shape {codes.shape} doesn't match {len(symbols)} symbols x {len(intervals)} intervals")
+        universe = self._ensure_universe(symbols, intervals)
+        pd.DataFrame([{"Timestamp": timestamp, "Universe": universe, "Codes": codes.tobytes()}]).to_sql(
+            RATINGS_TABLE, con=self.engine, if_exists='append', index=False, dtype={"Codes": LargeBinary})
+
+    def load(self, start=None, end=None):
+        """Archived snapshots between start and end (inclusive, either may be None).
+
+        Returns one (timestamps, codes, symbols, intervals) tuple per universe, codes being a
+        snapshots x symbols x intervals int8 array and timestamps ordered oldest first.
+        """
+        conditions = []
+        params = {}
+        if start is not None:
+            conditions.append('"Timestamp" >= :start')
+            params["start"] = start
+        if end is not None:
+            conditions.append('"Timestamp" <= :end')
+            params["end"] = end
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = pd.read_sql(text(f'SELECT * FROM {RATINGS_TABLE} {where} ORDER BY "Timestamp"'),
+                           con=self.engine, params=params, parse_dates=['Timestamp'])
+        # An old keyless table may list a universe twice; both rows describe the same layout
+        universes = pd.read_sql(f'SELECT * FROM {UNIVERSE_TABLE}', con=self.engine)
+        universes = universes.drop_duplicates('Universe').set_index('Universe')
+
+        loaded = []
+        for universe, group in rows.groupby('Universe', sort=False):
+            symbols = json.loads(universes.loc[universe, 'Symbols'])
+            intervals = json.loads(universes.loc[universe, 'Intervals'])
+            codes = np.frombuffer(b"".join(bytes(blob) for blob in group['Codes']), dtype=np.int8)
+            loaded.append((group['Timestamp'].to_numpy(), codes.reshape(len(group), len(symbols), len(intervals)),
+                           symbols, intervals))
+        return loaded
+
+def rescore(codes, intervals, weights):
+    """Scores of archived codes under new interval weights, in one vectorized pass.
+
+    codes is a snapshots x symbols x intervals array laid out in the given intervals order and
+    weights an {interval: weight} dict (intervals it doesn't name weigh 0). Returns snapshots x
+    symbols float64 scores, NaN for symbols without any rating in a snapshot.
+    """
+    vector = np.array([weights.get(interval, 0.0) for interval in intervals], dtype=np.float64)
+    scores = score_matrix(codes, vector)
+    scores[~(codes != MISSING).any(axis=2)] = np.nan
+    return scores
+
+def rescore_history(archive, weights, start=None, end=None):
+    """momentum_scores rows (Symbol, Momentum Score, Timestamp, Average Momentum) of the archive under weights."""
+    frames = []
+    for timestamps, codes, symbols, intervals in archive.load(start, end):
+        scores = rescore(codes, intervals, weights)
+        available = ~np.isnan(scores)
+        snapshot, symbol = np.nonzero(available)
+        averages = np.nansum(scores, axis=1) / np.maximum(available.sum(axis=1), 1)
+        frames.append(pd.DataFrame({
+            "Symbol": np.asarray(symbols, dtype=object)[symbol],
+            "Momentum Score": scores[snapshot, symbol],
+            "Timestamp": timestamps[snapshot],
+            "Average Momentum": averages[snapshot]
+        }))
+    if not frames:
+        return pd.DataFrame(columns=['Symbol', 'Momentum Score', 'Timestamp', 'Average Momentum'])
+    return pd.concat(frames, ignore_index=True).sort_values('Timestamp', kind='stable', ignore_index=True)
+
+def compare_weights(archive, profiles, start=None, end=None):
+    """Average Momentum per snapshot under each {name: {interval: weight}} profile, one column per profile.
+
+    The archive is read once; every profile is then a single pass over the same code array.
+    """
+    loaded = archive.load(start, end)
+    columns = {}
+    for name, weights in profiles.items():
+        parts = []
+        for timestamps, codes, symbols, intervals in loaded:
+            scores = rescore(codes, intervals, weights)
+            available = ~np.isnan(scores)
+            averages = np.nansum(scores, axis=1) / np.maximum(available.sum(axis=1), 1)
+            parts.append(pd.Series(np.where(available.any(axis=1), averages, np.nan), index=pd.DatetimeIndex(timestamps)))
+        columns[name] = pd.concat(parts).sort_index() if parts else pd.Series(dtype=np.float64)
+    return pd.DataFrame(columns)
+
+def parse_weights(spec):
+    """'1m=0.1,5m=0.1,...' into an {interval: weight} dict."""
+    weights = {}
+    for item in spec.split(","):
+        interval, weight = item.split("=")
+        weights[interval.strip()] = float(weight)
+    return weights
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score archived ratings under other interval weights")
+    parser.add_argument("--db-url", default=os.environ.get("MAVERICK_DB_URL"),
+                        help="SQLAlchemy URL of the database the collector writes to (default: $MAVERICK_DB_URL)")
+    parser.add_argument("--weights", action="append", required=True,
+                        help="interval weights as 1m=0.1,5m=0.1,...; repeat to compare several profiles")
+    parser.add_argument("--start", default=None)
+    parser.add_argument("--end", default=None)
+    parser.add_argument("--output", help="write the re-scored rows of the first profile to this CSV")
+    args = parser.parse_args()
+    if not args.db_url:
+        parser.error("--db-url or MAVERICK_DB_URL is required")
+
+    archive = RatingArchive(create_engine(args.db_url))
+    profiles = {spec: parse_weights(spec) for spec in args.weights}
+    started = time.perf_counter()
+    comparison = compare_weights(archive, profiles, args.start, args.end)
+    print(f"{len(comparison)} snapshots re-scored under {len(profiles)} profiles in {time.perf_counter() - started:.2f}s")
+    print(comparison.describe().T[['mean', 'std', 'min', 'max']])
+    if args.output:
+        rescore_history(archive, profiles[args.weights[0]], args.start, args.end).to_csv(args.output, index=False)
+        print(f"Re-scored rows written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+import argparse
+import ast
+import json
+import logging
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from maverick_ratelimit import TokenBucket
+
+def load_symbols(path="maverickv2_0.py", name="symbols"):
+    """Reads a hardcoded symbol list from one of the app scripts without importing (and running) it."""
+    with open(path, encoding="utf-8") as file:
+        tree = ast.parse(file.read())
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(getattr(target, "id", None) == name for target in node.targets):
+            return ast.literal_eval(node.value)
+    raise ValueError(f"No '{name}' list in {path}")
+
+def load_pairs(path="bnbpairs.json"):
+    with open(path, encoding="utf-8") as file:
+        return list(json.load(file).values())
+
+def synthetic_value(column, rng, price):
+    """Plausible value for one scanner column, enough for tradingview_ta to compute its analysis."""
+    if column.startswith("Recommend."):
+        return rng.uniform(-1, 1)
+    if column.startswith("Rec."):
+        return rng.choice([-1, 0, 1])
+    if column.startswith(("RSI", "Stoch", "UO", "ADX")):
+        return rng.uniform(0, 100)
+    if column == "W.R":
+        return rng.uniform(-100, 0)
+    if column.startswith("CCI20"):
+        return rng.uniform(-200, 200)
+    if column.startswith(("close", "open", "high", "low", "EMA", "SMA", "Pivot.", "BB.", "VWMA", "HullMA",
+                          "Ichimoku", "P.SAR")):
+        return price * rng.uniform(0.95, 1.05)
+    if column == "volume":
+        return rng.uniform(1e3, 1e7)
+    if column == "change":
+        return rng.uniform(-5, 5)
+    return rng.uniform(-1, 1)
+
+class ScannerStub:
+    """Local HTTP stand-in for TradingView's scanner endpoint (POST /<screener>/scan).
+
+    Recorded responses ({"EXCHANGE:SYMBOL": {"column": value}}) are served where available,
+    synthetic values otherwise. Tickers outside universe (when given) are left out of the
+    response like dead symbols. latency/jitter are seconds per request, error_rate is the
+    share of requests answered with HTTP 500, and above throttle_rate requests per second
+    (if set) requests are answered with HTTP 429.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.1, jitter=0.05, error_rate=0.0,
+                 throttle_rate=None, throttle_burst=10, universe=None, recorded=None, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.bucket = TokenBucket(throttle_rate, throttle_burst) if throttle_rate else None
+        self.universe = set(universe) if universe is not None else None
+        self.recorded = recorded or {}
+        self.rng = random.Random(seed)
+        self.counts = {}
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def _count(self, status):
+        with self._lock:
+            self.counts[status] = self.counts.get(status, 0) + 1
+
+    def total_requests(self):
+        with self._lock:
+            return sum(self.counts.values())
+
+    def _row(self, ticker, columns):
+        recorded = self.recorded.get(ticker, {})
+        # Seeded per ticker so every interval of a symbol shares one price level
+        rng = random.Random(f"{ticker}:{self.rng.random()}")
+        price = random.Random(ticker).uniform(0.01, 1000)
+        values = []
+        for column in columns:
+            base = column.split("|")[0]
+            values.append(recorded.get(column, recorded.get(base, synthetic_value(base, rng, price))))
+        return {"s": ticker, "d": values}
+
+    def respond(self, path, body):
+        """Returns (status, payload) for a scan request."""
+        time.sleep(max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter)))
+        if not path.endswith("/scan"):
+            return 404, {"error": "not found"}
+        if self.bucket is not None and not self.bucket.acquire(block=False):
+            return 429, {"error": "too many requests"}
+        if self.rng.random() < self.error_rate:
+            return 500, {"error": "internal error"}
+        tickers = body["symbols"]["tickers"]
+        columns = body["columns"]
+        rows = [
+            self._row(ticker, columns) for ticker in tickers
+            if self.universe is None or ticker.split(":")[-1] in self.universe
+        ]
+        return 200, {"totalCount": len(rows), "data": rows}
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                    status, payload = stub.respond(self.path, body)
+                except (ValueError, KeyError):
+                    status, payload = 400, {"error": "bad request"}
+                stub._count(status)
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        """Serves in a background thread and returns the base URL to use as TradingView.scan_url."""
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for TradingView's scanner endpoint")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=None)
+    parser.add_argument("--recorded", help="JSON file of recorded values per EXCHANGE:SYMBOL")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    recorded = None
+    if args.recorded:
+        with open(args.recorded, encoding="utf-8") as file:
+            recorded = json.load(file)
+    universe = load_symbols() + load_pairs()
+    stub = ScannerStub(port=args.port, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                       throttle_rate=args.throttle_rate, universe=universe, recorded=recorded)
+    logging.info(f"Scanner stand-in for {len(universe)} symbols at {stub.url}")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        stub.stop()
+
+if __name__ == "__main__":
+    main()
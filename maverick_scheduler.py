@@ -0,0 +1,114 @@
+import time
+from datetime import datetime
+from tradingview_ta import Interval
+
+# Candle length of each interval in seconds; candles are aligned to UTC midnight
+INTERVAL_SECONDS = {
+    Interval.INTERVAL_1_MINUTE: 60,
+    Interval.INTERVAL_5_MINUTES: 5 * 60,
+    Interval.INTERVAL_15_MINUTES: 15 * 60,
+    Interval.INTERVAL_30_MINUTES: 30 * 60,
+    Interval.INTERVAL_1_HOUR: 60 * 60,
+    Interval.INTERVAL_2_HOURS: 2 * 60 * 60,
+    Interval.INTERVAL_4_HOURS: 4 * 60 * 60,
+    Interval.INTERVAL_1_DAY: 24 * 60 * 60
+}
+
+# Longest time (seconds) a cell may be reused inside an open candle before it is refetched anyway
+DEFAULT_STALENESS = {
+    Interval.INTERVAL_1_MINUTE: 60,
+    Interval.INTERVAL_5_MINUTES: 60,
+    Interval.INTERVAL_15_MINUTES: 120,
+    Interval.INTERVAL_30_MINUTES: 300,
+    Interval.INTERVAL_1_HOUR: 300,
+    Interval.INTERVAL_2_HOURS: 600,
+    Interval.INTERVAL_4_HOURS: 900,
+    Interval.INTERVAL_1_DAY: 1800
+}
+
+# Staleness budget for intervals without an entry above
+FALLBACK_STALENESS = 60
+
+# Candles a cell may go without a successful fetch before its value is dropped as missing, so a
+# dead or delisted symbol stops being published with its last rating
+MAX_AGE_CANDLES = 3
+DEFAULT_MAX_AGE = {interval: MAX_AGE_CANDLES * length for interval, length in INTERVAL_SECONDS.items()}
+
+def candle_start(interval, now):
+    """Returns the epoch second at which the candle containing now opened, or None if unknown."""
+    length = INTERVAL_SECONDS.get(interval)
+    if length is None:
+        return None
+    return now - now % length
+
+class RefreshScheduler:
+    """Keeps the latest analysis per (symbol, interval) and decides which cells need a refetch.
+
+    A cell is due when it was never fetched, when its interval's candle rolled over since the
+    last fetch, or when its staleness budget ran out. A cell that keeps failing is dropped by
+    expire() once it is older than its interval's max age.
+    """
+
+    def __init__(self, intervals, staleness=None, max_age=None):
+        self.intervals = list(intervals)
+        self.staleness = dict(DEFAULT_STALENESS)
+        if staleness:
+            self.staleness.update(staleness)
+        self.max_age = dict(DEFAULT_MAX_AGE)
+        if max_age:
+            self.max_age.update(max_age)
+        self.cells = {}
+        self.fetched_at = {}
+
+    def is_due(self, symbol, interval, now=None):
+        now = time.time() if now is None else now
+        fetched = self.fetched_at.get((symbol, interval))
+        if fetched is None:
+            return True
+        start = candle_start(interval, now)
+        if start is not None and fetched < start:
+            return True
+        return now - fetched >= self.staleness.get(interval, FALLBACK_STALENESS)
+
+    def due_cells(self, symbols, now=None):
+        """Returns {interval: [symbols]} for every cell that should be fetched this cycle."""
+        now = time.time() if now is None else now
+        due = {}
+        for interval in self.intervals:
+            due_symbols = [symbol for symbol in symbols if self.is_due(symbol, interval, now)]
+            if due_symbols:
+                due[interval] = due_symbols
+        return due
+
+    def update(self, results, now=None):
+        """Stores fetched cells. Failed (None) cells keep their previous value, until expire(), and stay due.
+
+        A cell is aged from its analysis time, so values served from a shared or stale cache
+        are refetched as soon as they would have been had this process fetched them.
+        """
+        now = time.time() if now is None else now
+        for key, analysis in results.items():
+            if analysis is not None:
+                self.cells[key] = analysis
+                produced = analysis.time.timestamp() if isinstance(analysis.time, datetime) else now
+                self.fetched_at[key] = min(produced, now)
+
+    def get(self, symbol, interval):
+        return self.cells.get((symbol, interval))
+
+    def expire(self, now=None):
+        """Drops every cell older than its max age and returns their (symbol, interval) keys."""
+        now = time.time() if now is None else now
+        expired = [
+            key for key, fetched in self.fetched_at.items()
+            if now - fetched >= self.max_age.get(key[1], MAX_AGE_CANDLES * FALLBACK_STALENESS)
+        ]
+        return self.forget(expired)
+
+    def forget(self, cells):
+        """Drops the given cells, leaving them due; returns the keys that held a value."""
+        dropped = [key for key in cells if key in self.fetched_at]
+        for key in dropped:
+            self.cells.pop(key, None)
+            del self.fetched_at[key]
+        return dropped
@@ -0,0 +1,457 @@
+import argparse
+import logging
+import os
+import numpy as np
+import pandas as pd
+from sqlalchemy import (REAL, BigInteger, Column, DateTime, Float, ForeignKey, Index, Integer, MetaData, SmallInteger,
+                        String, Table, create_engine, func, inspect, select, text)
+from sqlalchemy.exc import IntegrityError
+from maverick_db import BulkWriter
+
+# Name the dashboards query; a view over the normalized tables once migrated
+LEGACY_TABLE = 'momentum_scores'
+# Where migrate() keeps the original wide table
+ARCHIVED_LEGACY_TABLE = 'momentum_scores_legacy'
+
+DAY_MS = 24 * 60 * 60 * 1000
+# Raw per-snapshot scores are kept this many days; older history only lives on in the rollups
+DEFAULT_RAW_RETENTION_DAYS = 7
+# Rollup resolutions in seconds and how many days each is kept (None: forever)
+ROLLUPS = {300: 90, 3600: 730, 86400: None}
+ROLLUP_NAMES = {'5m': 300, '1h': 3600, '1d': 86400}
+# symbol_id of the market-wide Average Momentum in score_rollups
+MARKET_ID = 0
+
+metadata = MetaData()
+
+# One row per snapshot: its aggregates are stored once instead of on every symbol's row
+snapshots = Table(
+    'snapshots', metadata,
+    # Epoch milliseconds of taken_at
+    Column('snapshot_id', BigInteger, primary_key=True, autoincrement=False),
+    # Naive UTC, as momentum_scores always stored it
+    Column('taken_at', DateTime, nullable=False),
+    Column('symbol_count', SmallInteger, nullable=False),
+    Column('average', Float),
+    Column('completeness', REAL),
+    # maverick_regime code the collector classified the snapshot's average into; NULL from other writers
+    Column('regime', SmallInteger),
+    Index('ix_snapshots_taken_at', 'taken_at')
+)
+
+symbols = Table(
+    'symbols', metadata,
+    Column('symbol_id', SmallInteger, primary_key=True, autoincrement=False),
+    Column('symbol', String(64), nullable=False, unique=True)
+)
+
+# The narrow fact table: 14 bytes of data per (snapshot, symbol) score. On PostgreSQL it is split
+# into one partition per UTC day of snapshot_id, so retention drops whole days
+snapshot_scores = Table(
+    'snapshot_scores', metadata,
+    Column('snapshot_id', BigInteger, ForeignKey('snapshots.snapshot_id', ondelete='CASCADE'), primary_key=True),
+    Column('symbol_id', SmallInteger, ForeignKey('symbols.symbol_id'), primary_key=True),
+    Column('score', REAL, nullable=False),
+    postgresql_partition_by='RANGE (snapshot_id)'
+)
+
+# Sum, count, min and max of the scores per resolution, bucket and symbol (MARKET_ID for Average
+# Momentum), upserted as every snapshot is stored
+score_rollups = Table(
+    'score_rollups', metadata,
+    # Bucket length in seconds, a key of ROLLUPS
+    Column('resolution', Integer, primary_key=True, autoincrement=False),
+    # Epoch milliseconds of the bucket start
+    Column('bucket_id', BigInteger, primary_key=True, autoincrement=False),
+    Column('symbol_id', SmallInteger, primary_key=True, autoincrement=False),
+    Column('total', Float, nullable=False),
+    Column('samples', Integer, nullable=False),
+    Column('min_score', REAL, nullable=False),
+    Column('max_score', REAL, nullable=False)
+)
+
+# Same columns and names momentum_scores had, so existing SELECTs keep working
+VIEW_SQL = f"""
+CREATE VIEW {LEGACY_TABLE} AS
+SELECT sy.symbol AS "Symbol", sc.score AS "Momentum Score", sn.taken_at AS "Timestamp", sn.average AS "Average Momentum"
+FROM snapshot_scores sc
+JOIN snapshots sn ON sn.snapshot_id = sc.snapshot_id
+JOIN symbols sy ON sy.symbol_id = sc.symbol_id
+"""
+
+def utc_naive(timestamp):
+    """pd.Timestamp in naive UTC; naive input is taken to be UTC already."""
+    timestamp = pd.Timestamp(timestamp)
+    return timestamp.tz_convert('UTC').tz_localize(None) if timestamp.tzinfo is not None else timestamp
+
+def snapshot_id(timestamp):
+    """Epoch milliseconds of a datetime, the snapshots primary key."""
+    return int(utc_naive(timestamp).value // 1_000_000)
+
+def _legacy_timestamp_sql(connection, column='"Timestamp"'):
+    """SQL of a legacy Timestamp column as naive UTC and of its epoch milliseconds, for the migration's INSERT ... SELECTs.
+
+    A timestamptz column is converted explicitly, so the session time zone can't shift it.
+    """
+    if connection.dialect.name == 'postgresql':
+        legacy = next(info for info in inspect(connection).get_columns(LEGACY_TABLE) if info['name'] == 'Timestamp')
+        utc = f"({column} AT TIME ZONE 'UTC')" if getattr(legacy['type'], 'timezone', False) else column
+        return utc, f"FLOOR(EXTRACT(EPOCH FROM {utc}) * 1000)::BIGINT"
+    # SQLite keeps naive UTC text
+    return column, (f"CAST(strftime('%s', {column}) AS INTEGER) * 1000 + "
+                    f"CAST(substr(strftime('%f', {column}), 4) AS INTEGER)")
+
+def partition_name(day):
+    """snapshot_scores partition of a day number (days since the epoch)."""
+    return f"snapshot_scores_p{pd.Timestamp(day * DAY_MS, unit='ms'):%Y%m%d}"
+
+def ensure_partitions(connection, snapshot_ids):
+    """Creates the day partitions the snapshot ids fall into (PostgreSQL only); returns their day numbers."""
+    days = sorted({int(snapshot) // DAY_MS for snapshot in snapshot_ids})
+    if connection.dialect.name == 'postgresql':
+        for day in days:
+            connection.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {partition_name(day)} PARTITION OF {snapshot_scores.name}
+            FOR VALUES FROM ({day * DAY_MS}) TO ({(day + 1) * DAY_MS})
+            """))
+    return days
+
+def update_rollups(connection, start, stop):
+    """Adds the snapshots with start <= snapshot_id < stop to every rollup.
+
+    Each snapshot must be added exactly once; the collector does it as it stores them.
+    """
+    least, greatest = ('LEAST', 'GREATEST') if connection.dialect.name == 'postgresql' else ('MIN', 'MAX')
+    upsert = text(f"""
+    INSERT INTO score_rollups (resolution, bucket_id, symbol_id, total, samples, min_score, max_score)
+    SELECT :resolution, snapshot_id - snapshot_id % :bucket_ms, symbol_id, SUM(score), COUNT(*), MIN(score), MAX(score)
+    FROM snapshot_scores
+    WHERE snapshot_id >= :start AND snapshot_id < :stop
+    GROUP BY snapshot_id - snapshot_id % :bucket_ms, symbol_id
+    UNION ALL
+    SELECT :resolution, snapshot_id - snapshot_id % :bucket_ms, {MARKET_ID}, SUM(average), COUNT(*), MIN(average), MAX(average)
+    FROM snapshots
+    WHERE snapshot_id >= :start AND snapshot_id < :stop AND average IS NOT NULL
+    GROUP BY snapshot_id - snapshot_id % :bucket_ms
+    ON CONFLICT (resolution, bucket_id, symbol_id) DO UPDATE SET
+        total = score_rollups.total + excluded.total,
+        samples = score_rollups.samples + excluded.samples,
+        min_score = {least}(score_rollups.min_score, excluded.min_score),
+        max_score = {greatest}(score_rollups.max_score, excluded.max_score)
+    """)
+    for resolution in ROLLUPS:
+        connection.execute(upsert, {"resolution": resolution, "bucket_ms": resolution * 1000,
+                                    "start": int(start), "stop": int(stop)})
+
+def read_rollups(engine, resolution, start, end=None, symbol=None):
+    """Mean, Min, Max and Samples per bucket of one symbol's score, or of Average Momentum when symbol is None.
+
+    resolution is a ROLLUPS key or ROLLUP_NAMES name; the frame is indexed by the UTC bucket start.
+    """
+    resolution = ROLLUP_NAMES.get(resolution, resolution)
+    params = {"resolution": resolution, "start": snapshot_id(start)}
+    conditions = ["r.resolution = :resolution", "r.bucket_id >= :start"]
+    if end is not None:
+        conditions.append("r.bucket_id < :end")
+        params["end"] = snapshot_id(end)
+    if symbol is None:
+        join = ""
+        conditions.append(f"r.symbol_id = {MARKET_ID}")
+    else:
+        join = "JOIN symbols sy ON sy.symbol_id = r.symbol_id"
+        conditions.append("sy.symbol = :symbol")
+        params["symbol"] = symbol
+    df = pd.read_sql(text(f"""
+    SELECT r.bucket_id, r.total / r.samples AS "Mean", r.min_score AS "Min", r.max_score AS "Max", r.samples AS "Samples"
+    FROM score_rollups r {join}
+    WHERE {' AND '.join(conditions)}
+    ORDER BY r.bucket_id
+    """), con=engine, params=params)
+    df.index = pd.to_datetime(df.pop('bucket_id'), unit='ms', utc=True).rename('Timestamp')
+    return df
+
+def read_regimes(engine, resolution, start, end=None):
+    """Regime of the last classified snapshot in every bucket of a rollup resolution, indexed like read_rollups."""
+    resolution = ROLLUP_NAMES.get(resolution, resolution)
+    params = {"bucket_ms": resolution * 1000, "start": snapshot_id(start)}
+    conditions = ["snapshot_id >= :start", "regime IS NOT NULL"]
+    if end is not None:
+        conditions.append("snapshot_id < :end")
+        params["end"] = snapshot_id(end)
+    df = pd.read_sql(text(f"""
+    SELECT sn.snapshot_id - sn.snapshot_id % :bucket_ms AS bucket_id, sn.regime AS "Regime"
+    FROM snapshots sn
+    JOIN (SELECT MAX(snapshot_id) AS snapshot_id FROM snapshots WHERE {' AND '.join(conditions)}
+          GROUP BY snapshot_id - snapshot_id % :bucket_ms) last ON last.snapshot_id = sn.snapshot_id
+    ORDER BY bucket_id
+    """), con=engine, params=params)
+    return pd.Series(df['Regime'].to_numpy(), name='Regime',
+                     index=pd.to_datetime(df['bucket_id'], unit='ms', utc=True).rename('Timestamp'))
+
+def apply_retention(engine, raw_days=DEFAULT_RAW_RETENTION_DAYS, now=None):
+    """Drops raw scores older than raw_days (whole day partitions on PostgreSQL) and rollups past their ROLLUPS age.
+
+    Snapshot rows and their aggregates are kept. Returns (raw partitions or rows dropped, rollup rows deleted).
+    """
+    today = snapshot_id(now if now is not None else pd.Timestamp.now(tz='UTC')) // DAY_MS
+    cutoff = today - raw_days
+    with engine.begin() as connection:
+        if connection.dialect.name == 'postgresql':
+            partitions = connection.execute(text(f"""
+            SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = '{snapshot_scores.name}'::regclass
+            """)).scalars().all()
+            dropped = [name for name in partitions if name < partition_name(cutoff)]
+            for name in dropped:
+                connection.execute(text(f'DROP TABLE {name}'))
+            raw = len(dropped)
+        else:
+            raw = connection.execute(snapshot_scores.delete().where(snapshot_scores.c.snapshot_id < cutoff * DAY_MS)).rowcount
+        rollups = 0
+        for resolution, days in ROLLUPS.items():
+            if days is not None:
+                rollups += connection.execute(score_rollups.delete().where(
+                    (score_rollups.c.resolution == resolution) & (score_rollups.c.bucket_id < (today - days) * DAY_MS)
+                )).rowcount
+    return raw, rollups
+
+def _add_symbols(connection, names):
+    """Gives every name not in the symbols table the next free id."""
+    known = set(connection.execute(select(symbols.c.symbol)).scalars())
+    new = sorted(set(names) - known)
+    if new:
+        start = (connection.execute(select(func.max(symbols.c.symbol_id))).scalar() or 0) + 1
+        connection.execute(symbols.insert(), [{"symbol_id": start + i, "symbol": name} for i, name in enumerate(new)])
+    return len(new)
+
+def migrate(engine):
+    """Moves the wide momentum_scores table into the normalized tables in one transaction.
+
+    Snapshot ids are assigned in SQL from the UTC Timestamp, bumped by a millisecond where two
+    snapshots fall in the same one, and the rollups are built from the copied snapshots. Unless
+    every legacy snapshot and score was copied the transaction is rolled back; otherwise the
+    original table is kept as ARCHIVED_LEGACY_TABLE and momentum_scores becomes the compatibility
+    view. Returns the number of symbols, snapshots and scores copied.
+    """
+    metadata.create_all(engine)
+    with engine.begin() as connection:
+        names = [row[0] for row in connection.execute(text(f'SELECT DISTINCT "Symbol" FROM {LEGACY_TABLE}'))]
+        added = _add_symbols(connection, names)
+
+        utc, epoch_ms = _legacy_timestamp_sql(connection)
+        copied = connection.execute(text(f"""
+        INSERT INTO snapshots (snapshot_id, taken_at, symbol_count, average)
+        SELECT MAX(ms - step) OVER (ORDER BY taken_at ROWS UNBOUNDED PRECEDING) + step, taken_at, symbol_count, average
+        FROM (
+            SELECT ms, taken_at, symbol_count, average, ROW_NUMBER() OVER (ORDER BY taken_at) - 1 AS step
+            FROM (
+                SELECT {epoch_ms} AS ms, {utc} AS taken_at, COUNT(*) AS symbol_count,
+                       AVG("Average Momentum") AS average
+                FROM {LEGACY_TABLE} WHERE "Timestamp" IS NOT NULL GROUP BY {utc}, {epoch_ms}
+            ) grouped
+        ) ordered
+        """)).rowcount
+        first, last = connection.execute(select(func.min(snapshots.c.snapshot_id), func.max(snapshots.c.snapshot_id))).one()
+
+        days = connection.execute(text(f'SELECT DISTINCT snapshot_id / {DAY_MS} FROM snapshots')).scalars().all()
+        ensure_partitions(connection, [day * DAY_MS for day in days])
+        # Joined on the same UTC expression taken_at was stored from, so every row finds its snapshot
+        scores = connection.execute(text(f"""
+        INSERT INTO snapshot_scores (snapshot_id, symbol_id, score)
+        SELECT sn.snapshot_id, sy.symbol_id, MAX(l."Momentum Score")
+        FROM {LEGACY_TABLE} l
+        JOIN snapshots sn ON sn.taken_at = {_legacy_timestamp_sql(connection, 'l."Timestamp"')[0]}
+        JOIN symbols sy ON sy.symbol = l."Symbol"
+        WHERE l."Momentum Score" IS NOT NULL
+        GROUP BY sn.snapshot_id, sy.symbol_id
+        """)).rowcount
+
+        expected_snapshots, expected_scores = connection.execute(text(f"""
+        SELECT (SELECT COUNT(DISTINCT "Timestamp") FROM {LEGACY_TABLE}),
+               (SELECT COUNT(*) FROM (SELECT DISTINCT "Timestamp", "Symbol" FROM {LEGACY_TABLE}
+                                      WHERE "Timestamp" IS NOT NULL AND "Momentum Score" IS NOT NULL) pairs)
+        """)).one()
+        if (copied, scores) != (expected_snapshots, expected_scores):
+            raise RuntimeError(f"Migration of {LEGACY_TABLE} copied {copied} of {expected_snapshots} snapshots and "
+                               f"{scores} of {expected_scores} scores; rolled back, {LEGACY_TABLE} left as it was")
+
+        if first is not None:
+            update_rollups(connection, first, last + 1)
+
+        connection.execute(text(f'ALTER TABLE {LEGACY_TABLE} RENAME TO {ARCHIVED_LEGACY_TABLE}'))
+        connection.execute(text(VIEW_SQL))
+    logging.info(f"Migrated {LEGACY_TABLE}: {added} symbols, {copied} snapshots, {scores} scores")
+    return {"symbols": added, "snapshots": copied, "scores": scores}
+
+def partition_scores(engine):
+    """Converts a plain snapshot_scores table, as created before partitioning, into the day-partitioned one.
+
+    PostgreSQL only. In one transaction the plain table is renamed aside, the partitioned table
+    and the partitions of its days are created, the rows are copied over and the plain table is
+    dropped; the momentum_scores view depending on it is recreated. Returns the rows moved, or
+    None when there was nothing to convert.
+    """
+    if engine.dialect.name != 'postgresql':
+        return None
+    with engine.begin() as connection:
+        kind = connection.execute(text(
+            f"SELECT relkind FROM pg_class WHERE oid = to_regclass('{snapshot_scores.name}')"
+        )).scalar()
+        if kind != 'r':
+            return None
+        # Blocks the other writers until the new table is in place
+        connection.execute(text(f'LOCK TABLE {snapshot_scores.name} IN ACCESS EXCLUSIVE MODE'))
+        inspector = inspect(connection)
+        had_view = LEGACY_TABLE in inspector.get_view_names()
+        if had_view:
+            connection.execute(text(f'DROP VIEW {LEGACY_TABLE}'))
+        # The primary key index keeps its name through the rename and would clash with the new table's
+        primary_key = inspector.get_pk_constraint(snapshot_scores.name)['name']
+        plain = f'{snapshot_scores.name}_plain'
+        connection.execute(text(f'ALTER TABLE {snapshot_scores.name} RENAME TO {plain}'))
+        if primary_key:
+            connection.execute(text(f'ALTER TABLE {plain} RENAME CONSTRAINT {primary_key} TO {plain}_pkey'))
+        snapshot_scores.create(connection)
+        days = connection.execute(text(f'SELECT DISTINCT snapshot_id / {DAY_MS} FROM {plain}')).scalars().all()
+        ensure_partitions(connection, [day * DAY_MS for day in days])
+        moved = connection.execute(text(f"""
+        INSERT INTO {snapshot_scores.name} (snapshot_id, symbol_id, score)
+        SELECT snapshot_id, symbol_id, score FROM {plain}
+        """)).rowcount
+        connection.execute(text(f'DROP TABLE {plain}'))
+        if had_view:
+            connection.execute(text(VIEW_SQL))
+    logging.info(f"Partitioned {snapshot_scores.name}: {moved} scores in {len(days)} day partitions")
+    return moved
+
+def ensure_schema(engine):
+    """Creates the normalized tables and the momentum_scores view, migrating the wide table if it is still there.
+
+    A snapshot_scores table created before partitioning is converted first (see partition_scores),
+    and snapshots stored before score_rollups existed are rolled up when it is created.
+    """
+    inspector = inspect(engine)
+    backfill = inspector.has_table(snapshots.name) and not inspector.has_table(score_rollups.name)
+    metadata.create_all(engine)
+    partition_scores(engine)
+    inspector = inspect(engine)
+    if 'regime' not in {column['name'] for column in inspector.get_columns(snapshots.name)}:
+        # snapshots tables created before regimes were stored with them
+        with engine.begin() as connection:
+            connection.execute(text(f'ALTER TABLE {snapshots.name} ADD COLUMN regime SMALLINT'))
+    if LEGACY_TABLE in inspector.get_table_names():
+        migrate(engine)
+        return
+    if backfill:
+        with engine.begin() as connection:
+            first, last = connection.execute(select(func.min(snapshots.c.snapshot_id),
+                                                    func.max(snapshots.c.snapshot_id))).one()
+            if first is not None:
+                update_rollups(connection, first, last + 1)
+        logging.info(f"Rolled up the snapshots stored before {score_rollups.name} existed")
+    if LEGACY_TABLE not in inspector.get_view_names():
+        with engine.begin() as connection:
+            connection.execute(text(VIEW_SQL))
+
+def check_schema(engine):
+    """Raises RuntimeError unless ensure_schema has run: the tables and the momentum_scores view exist.
+
+    The migration itself is left to the collector's startup and this module's CLI, so the apps
+    don't race each other renaming momentum_scores.
+    """
+    inspector = inspect(engine)
+    missing = [table.name for table in metadata.sorted_tables if not inspector.has_table(table.name)]
+    if LEGACY_TABLE not in inspector.get_view_names():
+        missing.append(f"{LEGACY_TABLE} view")
+    if missing:
+        raise RuntimeError(f"Snapshot schema not set up ({', '.join(missing)} missing); "
+                           f"start the collector or run python maverick_schema.py first")
+
+class SnapshotWriter:
+    """Writes momentum_scores-shaped snapshots into the normalized tables.
+
+    The schema must already be in place (see check_schema). A snapshot goes in as one transaction:
+    symbols seen for the first time are added to the symbols table, the snapshot row is inserted,
+    the scores go in through BulkWriter (COPY on PostgreSQL) into a day partition created on first
+    use, and the rollups are updated. Symbol ids are cached per process once committed.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.writer = BulkWriter(engine)
+        self.symbol_ids = None
+        self._days = set()
+
+    def _load_symbols(self, connection):
+        return dict(connection.execute(select(symbols.c.symbol, symbols.c.symbol_id)).all())
+
+    def write(self, df, completeness=None, regime=None):
+        """Stores one snapshot of (Symbol, Momentum Score, Timestamp, Average Momentum) rows; returns rows written.
+
+        regime is the collector's classification of the snapshot, see read_regimes.
+        """
+        df = df[df['Momentum Score'].notna()]
+        if df.empty:
+            return 0
+        if self.symbol_ids is None:
+            check_schema(self.engine)
+            with self.engine.connect() as connection:
+                self.symbol_ids = self._load_symbols(connection)
+        try:
+            return self._write(df, completeness, regime)
+        except IntegrityError:
+            # Most likely another writer added the same symbols first; their ids are just as good
+            logging.warning("Snapshot write conflicted, retrying with reloaded symbols")
+            with self.engine.connect() as connection:
+                self.symbol_ids = self._load_symbols(connection)
+            return self._write(df, completeness, regime)
+
+    def _write(self, df, completeness, regime):
+        names = df['Symbol'].tolist()
+        taken_at = utc_naive(df['Timestamp'].iloc[0])
+        snapshot = snapshot_id(taken_at)
+        average = df['Average Momentum'].iloc[0]
+        symbol_ids = self.symbol_ids
+        days = set()
+        with self.engine.begin() as connection:
+            if any(name not in symbol_ids for name in names):
+                _add_symbols(connection, [name for name in names if name not in symbol_ids])
+                symbol_ids = self._load_symbols(connection)
+            if snapshot // DAY_MS not in self._days:
+                days.update(ensure_partitions(connection, [snapshot]))
+            connection.execute(snapshots.insert(), {
+                "snapshot_id": snapshot,
+                "taken_at": taken_at.to_pydatetime(),
+                "symbol_count": len(df),
+                "average": None if pd.isna(average) else float(average),
+                "completeness": completeness,
+                "regime": regime
+            })
+            self.writer.write(pd.DataFrame({
+                "snapshot_id": snapshot,
+                "symbol_id": np.array([symbol_ids[name] for name in names], dtype=np.int64),
+                "score": df['Momentum Score'].to_numpy(dtype=np.float64)
+            }), snapshot_scores.name, connection)
+            update_rollups(connection, snapshot, snapshot + 1)
+        # Only cached once committed, a rolled back write leaves nothing behind
+        self.symbol_ids = symbol_ids
+        self._days.update(days)
+        return len(df)
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate momentum_scores to the normalized snapshot schema")
+    parser.add_argument("--db-url", default=os.environ.get("MAVERICK_DB_URL"),
+                        help="SQLAlchemy URL of the database the collector writes to (default: $MAVERICK_DB_URL)")
+    parser.add_argument("--retention", action="store_true", help="also apply the retention policy")
+    args = parser.parse_args()
+    if not args.db_url:
+        parser.error("--db-url or MAVERICK_DB_URL is required")
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    engine = create_engine(args.db_url)
+    ensure_schema(engine)
+    if args.retention:
+        raw, rollups = apply_retention(engine)
+        logging.info(f"Retention dropped {raw} raw partitions/rows and {rollups} rollup rows")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import numpy as np
+import pandas as pd
+from maverick_store import MISSING, RECOMMENDATION_CODES, encode_recommendation
+
+def encode_matrix(data, symbols, intervals):
+    """int8 symbols x intervals matrix of recommendation codes from a {(symbol, interval): analysis} dict.
+
+    Cells missing from data or without analysis are MISSING.
+    """
+    cells = [data.get((symbol, interval)) for symbol in symbols for interval in intervals]
+    ratings = pd.Series([None if analysis is None else analysis.summary['RECOMMENDATION'] for analysis in cells],
+                        dtype=object)
+    # Unknown ratings count as NEUTRAL, like encode_recommendation
+    codes = ratings.str.upper().map(RECOMMENDATION_CODES).fillna(0).where(ratings.notna(), MISSING)
+    return codes.to_numpy(dtype=np.int8).reshape(len(symbols), len(intervals))
+
+def weight_vector(intervals):
+    """Weights of an {interval: weight} dict, in the dict's order."""
+    return np.fromiter(intervals.values(), dtype=np.float64, count=len(intervals))
+
+def score_matrix(codes, weights):
+    """Weighted momentum score of every row of codes.
+
+    weights is an intervals vector, giving one score per symbol, or an intervals x profiles
+    matrix, giving a symbols x profiles matrix. MISSING cells contribute nothing.
+    """
+    values = np.where(codes == MISSING, 0, codes).astype(np.float64)
+    return values @ weights
+
+def summarize(scores, available):
+    """Aggregates over the symbols that have at least one analysis."""
+    scored = scores[available]
+    if not len(scored):
+        return {"count": 0, "average": None, "long": 0, "short": 0, "max": None, "min": None, "std": None}
+    return {
+        "count": len(scored),
+        "average": float(scored.mean()),
+        "long": int((scored > 0).sum()),
+        "short": int((scored < 0).sum()),
+        "max": float(scored.max()),
+        "min": float(scored.min()),
+        "std": float(scored.std())
+    }
+
+def score_universe(data, symbols, intervals):
+    """Scores every symbol of a {(symbol, interval): analysis} dict against the {interval: weight} dict.
+
+    Returns (scores, available, summary): the float64 score vector, the boolean mask of symbols
+    with at least one analysis (the others are error symbols) and summarize's aggregates plus
+    completeness, the share of all cells that have an analysis.
+    """
+    codes = encode_matrix(data, symbols, intervals)
+    present = codes != MISSING
+    available = present.any(axis=1)
+    scores = score_matrix(codes, weight_vector(intervals))
+    summary = summarize(scores, available)
+    summary["completeness"] = float(present.mean()) if present.size else 0.0
+    return scores, available, summary
+
+def scores_frame(symbols, scores, available, timestamp):
+    """momentum_scores rows (Symbol, Momentum Score, Timestamp, Average Momentum) of the available symbols."""
+    df = pd.DataFrame({
+        "Symbol": np.asarray(symbols, dtype=object)[available],
+        "Momentum Score": scores[available],
+        "Timestamp": timestamp
+    })
+    df['Average Momentum'] = df['Momentum Score'].mean()
+    return df
+
+class IncrementalScores:
+    """Scores and Average Momentum kept up to date cell by cell between cycles.
+
+    apply() only touches the symbols whose ratings changed: each changed cell moves its symbol's
+    score by weight * (new code - old code) and the running sum and count behind the average
+    follow. The running sum is recomputed from the matrix every len(symbols) changed cells so
+    float rounding can't accumulate.
+    """
+
+    def __init__(self, symbols, intervals):
+        self.symbols = list(symbols)
+        self.intervals = list(intervals)
+        self.weights = weight_vector(intervals)
+        self.symbol_index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.interval_index = {interval: j for j, interval in enumerate(self.intervals)}
+        self.codes = np.full((len(self.symbols), len(self.intervals)), MISSING, dtype=np.int8)
+        self.scores = np.zeros(len(self.symbols), dtype=np.float64)
+        self.cell_counts = np.zeros(len(self.symbols), dtype=np.int16)
+        self.total = 0.0
+        self.count = 0
+        self._changes_since_resync = 0
+
+    @property
+    def available(self):
+        return self.cell_counts > 0
+
+    @property
+    def average(self):
+        return self.total / self.count if self.count else None
+
+    def apply(self, results):
+        """Applies fetched {(symbol, interval): analysis} cells; None cells keep their previous rating.
+
+        Returns the delta list [(symbol, previous score or None, score or None)] of symbols whose
+        score or availability changed, None standing for a symbol without any rating.
+        """
+        return self._update(
+            (key, encode_recommendation(analysis)) for key, analysis in results.items() if analysis is not None
+        )
+
+    def expire(self, cells):
+        """Resets (symbol, interval) cells to MISSING, e.g. those dropped by RefreshScheduler.expire().
+
+        A symbol left without any rating leaves the average and the completeness count.
+        Returns the same delta list as apply().
+        """
+        return self._update((key, MISSING) for key in cells)
+
+    def _update(self, changes):
+        before = {}
+        for (symbol, interval), code in changes:
+            i = self.symbol_index.get(symbol)
+            j = self.interval_index.get(interval)
+            if i is None or j is None:
+                continue
+            old = self.codes[i, j]
+            if code == old:
+                continue
+            if i not in before:
+                before[i] = (float(self.scores[i]), bool(self.cell_counts[i] > 0))
+            self.codes[i, j] = code
+            self.scores[i] += self.weights[j] * ((0 if code == MISSING else int(code)) - (0 if old == MISSING else int(old)))
+            if old == MISSING:
+                self.cell_counts[i] += 1
+            elif code == MISSING:
+                self.cell_counts[i] -= 1
+            self._changes_since_resync += 1
+
+        deltas = []
+        for i, (previous, was_available) in before.items():
+            if was_available:
+                self.total -= previous
+                self.count -= 1
+            score = None
+            if self.cell_counts[i] > 0:
+                score = float(self.scores[i])
+                self.total += score
+                self.count += 1
+            else:
+                # Clears the rounding residue left by the increments
+                self.scores[i] = 0.0
+            deltas.append((self.symbols[i], previous if was_available else None, score))
+
+        if self._changes_since_resync >= len(self.symbols):
+            self.resync()
+        return [delta for delta in deltas if delta[1] != delta[2]]
+
+    def resync(self):
+        """Recomputes every score and the running aggregates from the rating matrix."""
+        self.scores = score_matrix(self.codes, self.weights)
+        available = self.available
+        self.total = float(self.scores[available].sum())
+        self.count = int(available.sum())
+        self._changes_since_resync = 0
+
+    def summary(self):
+        summary = summarize(self.scores, self.available)
+        summary["completeness"] = float((self.codes != MISSING).mean()) if self.codes.size else 0.0
+        return summary
+
+    def frame(self, timestamp):
+        """momentum_scores rows of the current state, see scores_frame."""
+        df = scores_frame(self.symbols, self.scores, self.available, timestamp)
+        df['Average Momentum'] = self.average
+        return df
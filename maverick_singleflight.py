@@ -0,0 +1,61 @@
+import logging
+import threading
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one execution whose result they all share.
+
+    Only calls that overlap in time are merged; nothing is remembered once the call returns.
+    A follower waits at most max_wait seconds (None: as long as it takes) for the leader and then
+    runs fn itself, so one hung call can't stall everyone asking for the same key.
+    """
+
+    def __init__(self, max_wait=None):
+        self.max_wait = max_wait
+        self.executed = 0
+        self.shared = 0
+        self.abandoned = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, *args, **kwargs):
+        """Runs fn(*args, **kwargs) unless a call for key is already in flight, in which case waits for it."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.executed += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            if not call.done.wait(self.max_wait):
+                with self._lock:
+                    self.abandoned += 1
+                logging.warning(f"In-flight call for {key!r:.80} still running after {self.max_wait}s, calling directly")
+                return fn(*args, **kwargs)
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        return {"executed": self.executed, "shared": self.shared, "abandoned": self.abandoned,
+                "in_flight": len(self._calls)}
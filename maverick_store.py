@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+from tradingview_ta import TradingView
+
+# int8 codes of the summary recommendation, ordered so they can be used as scores directly
+RECOMMENDATION_CODES = {'STRONG_SELL': -2, 'SELL': -1, 'NEUTRAL': 0, 'BUY': 1, 'STRONG_BUY': 2}
+# Code of a cell without analysis
+MISSING = -128
+
+def encode_recommendation(analysis):
+    """int8 code of an analysis' summary recommendation; unknown ratings count as NEUTRAL."""
+    if analysis is None:
+        return MISSING
+    return RECOMMENDATION_CODES.get(analysis.summary['RECOMMENDATION'].upper(), 0)
+
+# Price-unit indicators not covered by the EMA/SMA/Pivot prefixes
+PRICE_INDICATORS = {'open', 'high', 'low', 'close', 'VWMA', 'HullMA9', 'Ichimoku.BLine', 'P.SAR', 'BB.lower', 'BB.upper'}
+
+def is_price_indicator(name):
+    """True for indicators quoted in price units (close, moving averages, pivots, bands ...).
+
+    float32 keeps about 7 significant digits, too few for prices, so these are stored as float64.
+    """
+    return name in PRICE_INDICATORS or name.startswith(('EMA', 'SMA', 'Pivot.M.'))
+
+class SnapshotStore:
+    """Columnar snapshot of every (symbol, interval) analysis.
+
+    values is a float32 array of shape symbols x intervals x indicators (NaN where missing) and
+    recommendations an int8 array of shape symbols x intervals (MISSING where there is no analysis).
+    Price-unit indicators (see is_price_indicator) go to prices, the same layout in float64 over
+    price_indicators. symbol_index, interval_index and indicator_index map names to positions
+    along each axis; column() and to_frame() read from either array.
+    """
+
+    def __init__(self, symbols, intervals, indicators=None):
+        self.symbols = list(symbols)
+        self.intervals = list(intervals)
+        requested = list(indicators if indicators is not None else TradingView.indicators)
+        self.indicators = [name for name in requested if not is_price_indicator(name)]
+        self.price_indicators = [name for name in requested if is_price_indicator(name)]
+        self.symbol_index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.interval_index = {interval: i for i, interval in enumerate(self.intervals)}
+        self.indicator_index = {indicator: i for i, indicator in enumerate(self.indicators)}
+        self.indicator_index.update((indicator, i) for i, indicator in enumerate(self.price_indicators))
+        self.values = np.full((len(self.symbols), len(self.intervals), len(self.indicators)), np.nan, dtype=np.float32)
+        self.prices = np.full((len(self.symbols), len(self.intervals), len(self.price_indicators)), np.nan,
+                              dtype=np.float64)
+        self.recommendations = np.full((len(self.symbols), len(self.intervals)), MISSING, dtype=np.int8)
+
+    @classmethod
+    def from_analyses(cls, data, symbols, intervals, indicators=None):
+        """Builds a store from a {(symbol, interval): analysis} dict."""
+        store = cls(symbols, intervals, indicators)
+        store.update(data)
+        return store
+
+    def set(self, symbol, interval, analysis):
+        i, j = self.symbol_index[symbol], self.interval_index[interval]
+        self.recommendations[i, j] = encode_recommendation(analysis)
+        if analysis is None:
+            self.values[i, j] = np.nan
+            self.prices[i, j] = np.nan
+        else:
+            self.values[i, j] = [np.nan if analysis.indicators.get(name) is None else analysis.indicators[name]
+                                 for name in self.indicators]
+            self.prices[i, j] = [np.nan if analysis.indicators.get(name) is None else analysis.indicators[name]
+                                 for name in self.price_indicators]
+
+    def update(self, data):
+        """Writes every cell of a {(symbol, interval): analysis} dict; unknown symbols/intervals are skipped."""
+        for (symbol, interval), analysis in data.items():
+            if symbol in self.symbol_index and interval in self.interval_index:
+                self.set(symbol, interval, analysis)
+
+    @property
+    def available(self):
+        """Boolean symbols x intervals mask of cells that have an analysis."""
+        return self.recommendations != MISSING
+
+    def _array(self, indicator):
+        return self.prices if is_price_indicator(indicator) else self.values
+
+    def column(self, indicator, interval=None):
+        """One indicator for every symbol: symbols x intervals, or a symbols vector for a single interval."""
+        values = self._array(indicator)[:, :, self.indicator_index[indicator]]
+        if interval is not None:
+            return values[:, self.interval_index[interval]]
+        return values
+
+    def to_frame(self, indicators, interval):
+        """DataFrame of the given indicators for one interval, indexed by symbol."""
+        j = self.interval_index[interval]
+        return pd.DataFrame({indicator: self.column(indicator)[:, j] for indicator in indicators},
+                            index=self.symbols, columns=indicators)
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self.prices.nbytes + self.recommendations.nbytes
@@ -1,17 +1,11 @@
 import streamlit as st
 import csv
-from tradingview_ta import TA_Handler, Interval
+from tradingview_ta import Interval
+from maverick_fetch import DEFAULT_TIMEOUT, fetch_multiple_data
+from maverick_cache import AnalysisCache
 
-def fetch_all_data(symbol, exchange, screener, interval):
-    handler = TA_Handler(
-        symbol=symbol,
-        exchange=exchange,
-        screener=screener,
-        interval=interval,
-        timeout=None
-    )
-    analysis = handler.get_analysis()
-    return analysis
+# Analysis cache shared on disk with the collector and the dashboards
+cache = AnalysisCache()
 
 def save_to_csv(data, filename='coin_analysis_data.csv'):
     # Create and write to a CSV file
@@ -67,15 +61,10 @@ def main():
     ]
 
     if st.button("Fetch Data"):
-        data = {}
-        for symbol in symbols:
-            for interval in intervals:
-                try:
-                    analysis = fetch_all_data(symbol, exchange, screener, interval)
-                    data[(symbol, interval)] = analysis
-                except Exception as e:
-                    st.error(f"Error fetching data for {symbol} at interval {interval}: {e}")
-                    data[(symbol, interval)] = None
+        data = fetch_multiple_data(symbols, exchange, screener, intervals, timeout=DEFAULT_TIMEOUT, cache=cache)
+        failed = [f"{symbol} at interval {interval}" for (symbol, interval), analysis in data.items() if analysis is None]
+        if failed:
+            st.error(f"Error fetching data for {', '.join(failed)}")
 
         if data:
             save_to_csv(data)
@@ -3,11 +3,18 @@ import csv
 from tradingview_ta import TA_Handler, Interval
 from flask import Flask, request, jsonify
 from threading import Thread
+from maverick_cache import AnalysisCache
 
 # Initialize Flask app
 app = Flask(__name__)
 
+# Analysis cache shared on disk with the collector and the dashboards
+cache = AnalysisCache()
+
 def fetch_all_data(symbol, exchange, screener, interval):
+    analysis = cache.get(exchange, screener, symbol, interval)
+    if analysis is not None:
+        return analysis
     handler = TA_Handler(
         symbol=symbol,
         exchange=exchange,
@@ -16,6 +23,7 @@ def fetch_all_data(symbol, exchange, screener, interval):
         timeout=None
     )
     analysis = handler.get_analysis()
+    cache.set(exchange, screener, symbol, interval, analysis)
     return analysis
 
 def save_to_csv(data, filename='coin_analysis_data.csv'):
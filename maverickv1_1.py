@@ -1,13 +1,19 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from tradingview_ta import TA_Handler, Interval
+from tradingview_ta import Interval
 from datetime import datetime, timezone, timedelta
 import time
 import matplotlib.pyplot as plt
 import logging
 from sqlalchemy import create_engine
-from cachetools import TTLCache
+from maverick_schema import SnapshotWriter
+from maverick_fetch import DEFAULT_TIMEOUT, fetch_multiple_data
+from maverick_cache import AnalysisCache
+from maverick_ratelimit import RateLimiter
+from maverick_quarantine import SymbolQuarantine
+from maverick_scoring import score_universe, scores_frame
+from maverick_bands import BandIndex, band_filter_sidebar
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -22,9 +28,11 @@ DB_PORT = "5432"
 # Create SQLAlchemy engine
 db_url = f'postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
 engine = create_engine(db_url)
+# Normalized snapshot tables, read back through the momentum_scores view
+snapshot_writer = SnapshotWriter(engine)
 
-# Set up caching
-cache = TTLCache(maxsize=1000, ttl=300)  # Cache with 5-minute TTL
+# Set up caching, shared on disk with the collector and the other apps
+cache = AnalysisCache()
 
 # Set the page config
 st.set_page_config(
@@ -34,6 +42,17 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Token bucket, backoff and circuit breaker around every scanner request, shared by all
+# sessions so the request rate doesn't grow with the number of viewers
+@st.cache_resource
+def get_limiter():
+    return RateLimiter()
+
+# Symbols the scanner stopped answering for, rechecked on an exponential schedule
+@st.cache_resource
+def get_quarantine():
+    return SymbolQuarantine()
+
 # Custom CSS for dark theme and styles
 st.markdown("""
     <style>
@@ -121,36 +140,6 @@ intervals = {
     Interval.INTERVAL_1_DAY: 0.1
 }
 
-@st.cache_data(ttl=300)
-def fetch_all_data(symbol, exchange, screener, interval):
-    cache_key = f"{symbol}_{exchange}_{screener}_{interval}"
-    if cache_key in cache:
-        return cache[cache_key]
-    
-    try:
-        handler = TA_Handler(
-            symbol=symbol,
-            exchange=exchange,
-            screener=screener,
-            interval=interval,
-            timeout=None
-        )
-        analysis = handler.get_analysis()
-        cache[cache_key] = analysis
-        return analysis
-    except Exception as e:
-        logging.error(f"Error fetching data for {symbol} on {interval}: {str(e)}")
-        return None
-
-def calculate_momentum_score(data):
-    weights = {'STRONG_BUY': 2, 'BUY': 1, 'NEUTRAL': 0, 'SELL': -1, 'STRONG_SELL': -2}
-    score = 0
-    for interval, analysis in data.items():
-        if analysis:
-            rating = analysis.summary['RECOMMENDATION'].upper()
-            score += weights.get(rating, 0)
-    return score
-
 @st.cache_data(ttl=300)
 def get_historical_data():
     query = """
@@ -232,21 +221,6 @@ def display_top_20_scores(results, historical_df):
     
     return long_df, short_df
 
-def display_filtered_scores(results, historical_df):
-    df = pd.DataFrame(results)
-    df['Previous Score'] = df['Symbol'].map(historical_df.set_index('Symbol')['Momentum Score'].to_dict())
-    df['Change'] = df['Momentum Score'] - df['Previous Score'].fillna(0)
-    df['Momentum Score'] = df['Momentum Score'].round(2)
-    df['Change'] = df['Change'].round(2)
-    
-    positive_filter = (df['Momentum Score'].between(0.1, 0.4)) & (df['Change'].between(1.1, 1.5))
-    negative_filter = (df['Momentum Score'].between(-0.4, -0.1)) & (df['Change'].between(-1.5, -1.1))
-    
-    positive_df = df[positive_filter].sort_values('Change', ascending=False)
-    negative_df = df[negative_filter].sort_values('Change', ascending=True)
-    
-    return positive_df, negative_df
-
 def main():
     st.title('Crypto Market Momentum Score Dashboard')
     
@@ -254,6 +228,8 @@ def main():
     st.sidebar.title("Symbol Selection")
     selected_symbol = st.sidebar.selectbox("Select a symbol to plot", symbols, index=symbols.index("BTCUSDT.P"))
     
+    bands = band_filter_sidebar(st)
+    
     plot_placeholder = st.empty()
     
     col1, col2, col3 = st.columns(3)
@@ -262,9 +238,9 @@ def main():
     short_scores_placeholder = col1.empty()
     
     metrics_placeholder = col2.empty()
+    quarantine_placeholder = col2.empty()
     
-    positive_filter_placeholder = col3.empty()
-    negative_filter_placeholder = col3.empty()
+    band_filters_placeholder = col3.empty()
     
     while True:
         try:
@@ -273,27 +249,19 @@ def main():
             df['Timestamp'] = df['Timestamp'].dt.tz_localize('UTC')
             historical_df = df[['Symbol', 'Momentum Score']].copy()
             
-            results = []
-            error_symbols = []
             current_datetime = datetime.now(timezone.utc)
             
-            for symbol in symbols:
-                data = {}
-                for interval, weight in intervals.items():
-                    analysis = fetch_all_data(symbol, exchange, screener, interval)
-                    data[interval] = analysis
-                
-                if all(value is None for value in data.values()):
-                    error_symbols.append(symbol)
-                else:
-                    weighted_score = sum(weight * calculate_momentum_score({interval: data[interval]}) for interval, weight in intervals.items() if data[interval] is not None)
-                    results.append({"Symbol": symbol, "Momentum Score": weighted_score, "Timestamp": current_datetime})
+            # One scanner request per interval and batch instead of one per (symbol, interval)
+            all_data = fetch_multiple_data(symbols, exchange, screener, intervals, timeout=DEFAULT_TIMEOUT, cache=cache,
+                                           limiter=get_limiter(), quarantine=get_quarantine())
             
-            new_df = pd.DataFrame(results)
-            new_df['Average Momentum'] = new_df['Momentum Score'].mean()
+            # Every weighted score and the Average Momentum from one int8 matrix-vector product
+            scores, available, summary = score_universe(all_data, symbols, intervals)
+            new_df = scores_frame(symbols, scores, available, current_datetime)
+            results = new_df.to_dict('records')
             
             # Save the updated DataFrame to PostgreSQL
-            new_df.to_sql('momentum_scores', con=engine, if_exists='append', index=False)
+            snapshot_writer.write(new_df, summary['completeness'])
             
             # Combine new data with historical data for plotting
             df = pd.concat([df, new_df], ignore_index=True)
@@ -305,8 +273,9 @@ def main():
             # Display top 20 scores
             long_df, short_df = display_top_20_scores(results, historical_df)
             
-            # Display filtered scores
-            positive_df, negative_df = display_filtered_scores(results, historical_df)
+            # Every saved band filter against one (score, change) index of the snapshot
+            band_index = BandIndex.from_scores(dict(zip(new_df['Symbol'], new_df['Momentum Score'])),
+                                               historical_df.set_index('Symbol')['Momentum Score'].to_dict())
             
             # Update the placeholders with the latest data
             with long_scores_placeholder.container():
@@ -323,13 +292,16 @@ def main():
                 st.metric("Avg Change in Top 20 Long Scores", f"{avg_change_long:.2f}", f"{avg_change_long:.2f}")
                 st.metric("Avg Change in Top 20 Short Scores", f"{avg_change_short:.2f}", f"{avg_change_short:.2f}")
             
-            with positive_filter_placeholder.container():
-                st.subheader("Symbols with Momentum 0.1 to 0.4 & Change 1.1 to 1.5:")
-                st.dataframe(positive_df[['Symbol', 'Momentum Score', 'Change']])
+            with quarantine_placeholder.container():
+                quarantined = get_quarantine().report()
+                if quarantined:
+                    st.subheader(f"Quarantined Symbols ({len(quarantined)}):")
+                    st.dataframe(pd.DataFrame(quarantined))
             
-            with negative_filter_placeholder.container():
-                st.subheader("Symbols with Momentum -0.4 to -0.1 & Change -1.5 to -1.1:")
-                st.dataframe(negative_df[['Symbol', 'Momentum Score', 'Change']])
+            with band_filters_placeholder.container():
+                for name, band_df in band_index.evaluate(bands).items():
+                    st.subheader(f"Symbols with {name}:")
+                    st.dataframe(band_df)
             
             # Sleep for a certain interval before the next update
             time.sleep(60)  # Adjust as needed
@@ -337,7 +309,8 @@ def main():
         except Exception as e:
             logging.error(f"An error occurred: {str(e)}")
             st.error(f"An error occurred: {str(e)}")
-            time.sleep(600)  # Wait before retrying
+            # Throttling is absorbed by the rate limiter and cache, so retry on the normal cadence
+            time.sleep(60)
 
 if __name__ == "__main__":
     main()
@@ -6,6 +6,11 @@ import matplotlib.pyplot as plt
 import logging
 from sqlalchemy import create_engine
 import time  # Add this import
+from maverick_db import HistoryReader
+from maverick_ranking import DEFAULT_TOP_N, TopNTracker
+from maverick_bands import BandIndex, band_filter_sidebar
+from maverick_breadth import BREADTH_TABLE
+from maverick_regime import REGIME_NAMES, regime_segments
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -102,52 +107,29 @@ symbols = [
     "XVGUSDT.P", "XVSUSDT.P", "YFIUSDT.P", "YGGUSDT.P", "ZECUSDT.P", "ZENUSDT.P", "ZILUSDT.P", "ZRXUSDT.P"
 ]
 
-@st.cache_data(ttl=120)
-def get_historical_data():
-    query = """
-    SELECT * FROM momentum_scores 
-    WHERE "Timestamp" >= NOW() - INTERVAL '24 hours'
-    ORDER BY "Timestamp" DESC
-    """
-    return pd.read_sql(query, con=engine, parse_dates=['Timestamp'])
+def get_latest_breadth():
+    """Newest precomputed breadth row written by the collector, or None if there is none yet."""
+    try:
+        df = pd.read_sql(f'SELECT * FROM {BREADTH_TABLE} ORDER BY "Timestamp" DESC LIMIT 1', con=engine)
+    except Exception as e:
+        logging.warning(f"No breadth data available: {str(e)}")
+        return None
+    return df.iloc[0] if not df.empty else None
 
-def update_plot(df, selected_symbols):
+def update_plot(history, selected_symbols):
     fig, ax = plt.subplots(figsize=(12, 6))
     
-    df['Timestamp'] = pd.to_datetime(df['Timestamp'], utc=True)
-    df = df.sort_values('Timestamp')
-    
-    avg_momentum = df['Average Momentum']
-    
-    for i in range(1, len(avg_momentum)):
-        start = df['Timestamp'].iloc[i-1]
-        end = df['Timestamp'].iloc[i]
-        y1 = avg_momentum.iloc[i-1]
-        y2 = avg_momentum.iloc[i]
-        
-        if y1 > 0.5 and y2 > 0.5:
-            color = 'green'
-        elif y1 < -0.5 and y2 < -0.5:
-            color = 'red'
-        elif -0.5 <= y1 <= 0.5 and -0.5 <= y2 <= 0.5:
-            color = 'grey'
-        else:
-            if y2 > 0.5:
-                color = 'green'
-            elif y2 < -0.5:
-                color = 'red'
-            else:
-                color = 'grey'
-        
-        ax.plot([start, end], [y1, y2], color=color)
+    # Regimes are classified (with hysteresis) once per snapshot as it is appended, not per draw
+    for timestamps, values, color in regime_segments(history.average_series(), history.regime_series()):
+        ax.plot(timestamps, values, color=color)
     
     ax.plot([], [], color='blue', label='Average Total Momentum Scores')
     
     colors = ['yellow', 'purple', 'orange']
     for i, symbol in enumerate(selected_symbols):
-        symbol_data = df[df['Symbol'] == symbol]
+        symbol_data = history.series(symbol)
         if not symbol_data.empty:
-            ax.plot(symbol_data['Timestamp'], symbol_data['Momentum Score'], color=colors[i], label=f'Momentum Score for {symbol}')
+            ax.plot(symbol_data.index, symbol_data.values, color=colors[i], label=f'Momentum Score for {symbol}')
         else:
             logging.warning(f"No data available for plotting {symbol}")
     
@@ -163,36 +145,6 @@ def update_plot(df, selected_symbols):
     
     return fig
 
-def display_top_20_scores(results, historical_df):
-    sorted_results = sorted(results, key=lambda x: x['Momentum Score'], reverse=True)
-    
-    long_df = pd.DataFrame(sorted_results[:20])
-    short_df = pd.DataFrame(sorted_results[-20:][::-1])
-    
-    for df in [long_df, short_df]:
-        if not df.empty:
-            df['Previous Score'] = df['Symbol'].map(historical_df.set_index('Symbol')['Momentum Score'].to_dict())
-            df['Change'] = df['Momentum Score'] - df['Previous Score'].fillna(0)
-            df['Momentum Score'] = df['Momentum Score'].round(2)
-            df['Change'] = df['Change'].round(2)
-    
-    return long_df, short_df
-
-def display_filtered_scores(results, historical_df):
-    df = pd.DataFrame(results)
-    df['Previous Score'] = df['Symbol'].map(historical_df.set_index('Symbol')['Momentum Score'].to_dict())
-    df['Change'] = df['Momentum Score'] - df['Previous Score'].fillna(0)
-    df['Momentum Score'] = df['Momentum Score'].round(2)
-    df['Change'] = df['Change'].round(2)
-    
-    positive_filter = (df['Momentum Score'].between(0.1, 0.4)) & (df['Change'].between(1.1, 1.5))
-    negative_filter = (df['Momentum Score'].between(-0.4, -0.1)) & (df['Change'].between(-1.5, -1.1))
-    
-    positive_df = df[positive_filter].sort_values('Change', ascending=False)
-    negative_df = df[negative_filter].sort_values('Change', ascending=True)
-    
-    return positive_df, negative_df
-
 def main():
     st.title('Crypto Market Momentum Score Dashboard')
     
@@ -209,6 +161,10 @@ def main():
         st.sidebar.warning("BTCUSDT.P is always included in the plot.")
         selected_symbols = ["BTCUSDT.P"] + selected_symbols[:2]
     
+    top_n = st.sidebar.slider("Symbols per long/short panel", 5, 50, DEFAULT_TOP_N)
+    
+    bands = band_filter_sidebar(st)
+    
     plot_placeholder = st.empty()
     
     col1, col2, col3 = st.columns(3)
@@ -218,51 +174,63 @@ def main():
     
     metrics_placeholder = col2.empty()
     
-    positive_filter_placeholder = col3.empty()
-    negative_filter_placeholder = col3.empty()
+    band_filters_placeholder = col3.empty()
+    
+    # Symbols ordered by score, updated only where the score changed
+    ranking = TopNTracker(top_n)
+    
+    # Last 24 hours of scores, read from PostgreSQL once; later cycles only read the rows past the watermark
+    reader = HistoryReader(engine, symbols)
     
     while True:
         try:
-            # Read existing data from PostgreSQL
-            df = get_historical_data()
-            df['Timestamp'] = df['Timestamp'].dt.tz_localize('UTC')
-            historical_df = df[['Symbol', 'Momentum Score']].copy()
+            reader.refresh()
+            history = reader.history
             
             # Get the latest results
-            latest_results = df[df['Timestamp'] == df['Timestamp'].max()].to_dict('records')
+            latest_timestamp, latest_scores = history.latest()
+            previous_scores = history.first_scores()
             
             # Update plot
-            fig = update_plot(df, selected_symbols)
+            fig = update_plot(history, selected_symbols)
             plot_placeholder.pyplot(fig)
             
-            # Display top 20 scores
-            long_df, short_df = display_top_20_scores(latest_results, historical_df)
+            # Display top scores, re-ranking only the symbols whose score moved
+            ranking.set_reference(previous_scores)
+            ranking.sync(latest_scores)
+            long_df, short_df = ranking.panels()
             
-            # Display filtered scores
-            positive_df, negative_df = display_filtered_scores(latest_results, historical_df)
+            # Every saved band filter against one (score, change) index of the snapshot
+            band_index = BandIndex.from_scores(latest_scores, previous_scores)
             
             # Update the placeholders with the latest data
             with long_scores_placeholder.container():
-                st.subheader("Top 20 Long Momentum Scores:")
+                st.subheader(f"Top {top_n} Long Momentum Scores:")
                 st.dataframe(long_df[['Symbol', 'Momentum Score', 'Change']])
             
             with short_scores_placeholder.container():
-                st.subheader("Top 20 Short Momentum Scores:")
+                st.subheader(f"Top {top_n} Short Momentum Scores:")
                 st.dataframe(short_df[['Symbol', 'Momentum Score', 'Change']])
             
             with metrics_placeholder.container():
                 avg_change_long = long_df['Change'].mean()
                 avg_change_short = short_df['Change'].mean()
-                st.metric("Avg Change in Top 20 Long Scores", f"{avg_change_long:.2f}", f"{avg_change_long:.2f}")
-                st.metric("Avg Change in Top 20 Short Scores", f"{avg_change_short:.2f}", f"{avg_change_short:.2f}")
-            
-            with positive_filter_placeholder.container():
-                st.subheader("Symbols with Momentum 0.1 to 0.4 & Change 1.1 to 1.5:")
-                st.dataframe(positive_df[['Symbol', 'Momentum Score', 'Change']])
+                st.metric(f"Avg Change in Top {top_n} Long Scores", f"{avg_change_long:.2f}", f"{avg_change_long:.2f}")
+                st.metric(f"Avg Change in Top {top_n} Short Scores", f"{avg_change_short:.2f}", f"{avg_change_short:.2f}")
+                st.metric("Momentum Regime", REGIME_NAMES[history.latest_regime].capitalize())
+                breadth = get_latest_breadth()
+                if breadth is not None and breadth['Symbols']:
+                    st.metric("Symbols Above +0.5", f"{breadth['Share Above']:.0%}")
+                    st.metric("Symbols Below -0.5", f"{breadth['Share Below']:.0%}")
+                    # No BTC row in the snapshot reads back as NULL
+                    btc = f"{breadth['BTC Score']:.2f}" if pd.notna(breadth['BTC Score']) else "n/a"
+                    st.write(f"Median {breadth['P50']:.2f}, P10 {breadth['P10']:.2f}, P90 {breadth['P90']:.2f}, "
+                             f"Std {breadth['Std']:.2f}, BTC {btc}")
             
-            with negative_filter_placeholder.container():
-                st.subheader("Symbols with Momentum -0.4 to -0.1 & Change -1.5 to -1.1:")
-                st.dataframe(negative_df[['Symbol', 'Momentum Score', 'Change']])
+            with band_filters_placeholder.container():
+                for name, band_df in band_index.evaluate(bands).items():
+                    st.subheader(f"Symbols with {name}:")
+                    st.dataframe(band_df)
             
             # Sleep for 2 minutes before the next update
             time.sleep(120)
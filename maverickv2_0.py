@@ -1,14 +1,23 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from tradingview_ta import TA_Handler, Interval
+from tradingview_ta import Interval
 from datetime import datetime, timezone, timedelta
 import time
 import matplotlib.pyplot as plt
 import logging
 from logging.handlers import RotatingFileHandler
 from sqlalchemy import create_engine
-from cachetools import TTLCache
+from maverick_schema import SnapshotWriter, read_regimes, read_rollups
+from maverick_fetch import DEFAULT_TIMEOUT, fetch_multiple_data
+from maverick_cache import AnalysisCache
+from maverick_ratelimit import RateLimiter
+from maverick_quarantine import SymbolQuarantine
+from maverick_scoring import score_universe, scores_frame
+from maverick_db import HistoryReader
+from maverick_ranking import DEFAULT_TOP_N, TopNTracker
+from maverick_breadth import breadth_stats, write_breadth, symbol_breadth
+from maverick_regime import NEUTRAL, regime_segments
 from collections import defaultdict
 
 # Set up logging with rotation
@@ -35,9 +44,11 @@ DB_PORT = "5432"
 # Create SQLAlchemy engine
 db_url = f'postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
 engine = create_engine(db_url)
+# Snapshots go to the normalized tables; momentum_scores is the view over them
+snapshot_writer = SnapshotWriter(engine)
 
-# Set up caching
-cache = TTLCache(maxsize=1000, ttl=300)  # Cache with 5-minute TTL
+# Set up caching, shared on disk with the collector and the other apps
+cache = AnalysisCache()
 
 # Last cache clear time
 last_cache_clear = datetime.now()
@@ -50,6 +61,17 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Token bucket, backoff and circuit breaker around every scanner request, shared by all
+# sessions so the request rate doesn't grow with the number of viewers
+@st.cache_resource
+def get_limiter():
+    return RateLimiter()
+
+# Symbols the scanner stopped answering for, rechecked on an exponential schedule
+@st.cache_resource
+def get_quarantine():
+    return SymbolQuarantine()
+
 # Custom CSS for dark theme and styles
 st.markdown("""
     <style>
@@ -147,85 +169,28 @@ def log_error(error_message):
         error_counts.clear()
         last_log_time = time.time()
 
-@st.cache_data(ttl=3600)
-def fetch_all_data(symbol, exchange, screener, interval):
-    cache_key = f"{symbol}_{exchange}_{screener}_{interval}"
-    if cache_key in cache:
-        return cache[cache_key]
-    
-    try:
-        handler = TA_Handler(
-            symbol=symbol,
-            exchange=exchange,
-            screener=screener,
-            interval=interval,
-            timeout=None
-        )
-        analysis = handler.get_analysis()
-        cache[cache_key] = analysis
-        return analysis
-    except Exception as e:
-        log_error(f"Error fetching data for {symbol} on {interval}: {str(e)}")
-        return None
-
-def calculate_momentum_score(data):
-    weights = {'STRONG_BUY': 2, 'BUY': 1, 'NEUTRAL': 0, 'SELL': -1, 'STRONG_SELL': -2}
-    score = 0
-    for interval, analysis in data.items():
-        if analysis:
-            rating = analysis.summary['RECOMMENDATION'].upper()
-            score += weights.get(rating, 0)
-    return score
-
-@st.cache_data(ttl=3600)
-def get_historical_data():
-    query = """
-    SELECT * FROM momentum_scores 
-    WHERE "Timestamp" >= NOW() - INTERVAL '24 hours'
-    ORDER BY "Timestamp" DESC
-    """
-    return pd.read_sql(query, con=engine, parse_dates=['Timestamp'])
+# Plot ranges and the rollup each one is drawn from
+PLOT_RANGES = {"24 hours": (timedelta(hours=24), '5m'), "7 days": (timedelta(days=7), '1h'),
+               "90 days": (timedelta(days=90), '1d')}
 
-def update_plot(df):
+def update_plot(plot_range):
     fig, ax = plt.subplots(figsize=(12, 6))
     
-    df['Timestamp'] = pd.to_datetime(df['Timestamp'], utc=True)
-    df = df.sort_values('Timestamp')
+    # Read the precomputed rollup of the range instead of resampling raw snapshots on every refresh
+    span, resolution = PLOT_RANGES[plot_range]
+    start = datetime.now(timezone.utc) - span
+    avg_momentum = read_rollups(engine, resolution, start)['Mean']
     
-    # Reduce data points by resampling
-    df_resampled = df.set_index('Timestamp').resample('5T').mean().reset_index()
-    
-    avg_momentum = df_resampled['Average Momentum']
-    
-    for i in range(1, len(avg_momentum)):
-        start = df_resampled['Timestamp'].iloc[i-1]
-        end = df_resampled['Timestamp'].iloc[i]
-        y1 = avg_momentum.iloc[i-1]
-        y2 = avg_momentum.iloc[i]
-        
-        if y1 > 0.5 and y2 > 0.5:
-            color = 'green'
-        elif y1 < -0.5 and y2 < -0.5:
-            color = 'red'
-        elif -0.5 <= y1 <= 0.5 and -0.5 <= y2 <= 0.5:
-            color = 'grey'
-        else:
-            if y2 > 0.5:
-                color = 'green'
-            elif y2 < -0.5:
-                color = 'red'
-            else:
-                color = 'grey'
-        
-        ax.plot([start, end], [y1, y2], color=color)
+    # Regimes the collector stored, the last one of each bucket; buckets it didn't write carry the previous one
+    regimes = read_regimes(engine, resolution, start).reindex(avg_momentum.index, method='ffill').fillna(NEUTRAL)
+    for timestamps, values, color in regime_segments(avg_momentum, regimes):
+        ax.plot(timestamps, values, color=color)
     
     ax.plot([], [], color='blue', label='Average Total Momentum Scores')
     
-    btc_data = df[df['Symbol'] == 'BTCUSDT.P']
+    btc_data = read_rollups(engine, resolution, start, symbol='BTCUSDT.P')['Mean']
     if not btc_data.empty:
-        btc_data_resampled = btc_data.set_index('Timestamp').resample('5T').mean().reset_index()
-        ax.plot(btc_data_resampled['Timestamp'], btc_data_resampled['Momentum Score'], 
-                color='yellow', label='Momentum Score for BTCUSDT.P')
+        ax.plot(btc_data.index, btc_data.values, color='yellow', label='Momentum Score for BTCUSDT.P')
     else:
         logging.warning("No BTC data available for plotting")
     
@@ -247,38 +212,24 @@ def update_plot(df):
     
     return fig
 
-def display_top_20_scores(results, historical_df):
-    sorted_results = sorted(results, key=lambda x: x['Momentum Score'], reverse=True)
-    
-    long_df = pd.DataFrame(sorted_results[:20])
-    short_df = pd.DataFrame(sorted_results[-20:][::-1])
-    
-    for df in [long_df, short_df]:
-        if not df.empty:
-            df['Previous Score'] = df['Symbol'].map(historical_df.set_index('Symbol')['Momentum Score'].to_dict())
-            df['Change'] = df['Momentum Score'] - df['Previous Score'].fillna(0)
-            df['Momentum Score'] = df['Momentum Score'].round(2)
-            df['Change'] = df['Change'].round(2)
-    
-    return long_df, short_df
-
 def selective_cache_clear():
     global last_cache_clear
     current_time = datetime.now()
     
     if current_time - last_cache_clear >= timedelta(hours=1):
-        cache.clear()
-        logging.info("TTLCache cleared")
-        
-        for caching_function in [fetch_all_data, get_historical_data]:
-            caching_function.clear()
-        logging.info("Streamlit cache selectively cleared")
+        # The analysis cache is shared with other processes, so only drop what already expired
+        purged = cache.purge_expired()
+        logging.info(f"Purged {purged} expired analysis cache entries, stats: {cache.stats()}")
+        logging.info(f"Rate limiter: {get_limiter().status()}")
         
         last_cache_clear = current_time
 
 def main():
     st.title('Crypto Market Momentum Score Dashboard')
     
+    top_n = st.sidebar.slider("Symbols per long/short panel", 5, 50, DEFAULT_TOP_N)
+    plot_range = st.sidebar.selectbox("Plot range", list(PLOT_RANGES))
+    
     col1, col2 = st.columns([3, 1])
     
     with col1:
@@ -287,58 +238,78 @@ def main():
     with col2:
         long_scores_placeholder = st.empty()
         short_scores_placeholder = st.empty()
+        breadth_placeholder = st.empty()
+        quarantine_placeholder = st.empty()
+    
+    # Symbols ordered by score, updated only where the score changed
+    ranking = TopNTracker(top_n)
+    
+    # Last 24 hours of scores, read from PostgreSQL once; later cycles only read the rows past the watermark,
+    # the collector's snapshots and this dashboard's own alike
+    reader = HistoryReader(engine, symbols)
     
     while True:
         try:
-            # Read existing data from PostgreSQL
-            df = get_historical_data()
-            df['Timestamp'] = df['Timestamp'].dt.tz_localize('UTC')
-            historical_df = df[['Symbol', 'Momentum Score']].copy()
+            reader.refresh()
+            previous_scores = reader.history.first_scores()
             
-            results = []
-            error_symbols = []
             current_datetime = datetime.now(timezone.utc)
             
-            for symbol in symbols:
-                data = {}
-                for interval, weight in intervals.items():
-                    analysis = fetch_all_data(symbol, exchange, screener, interval)
-                    data[interval] = analysis
-                
-                if all(value is None for value in data.values()):
-                    error_symbols.append(symbol)
-                else:
-                    weighted_score = sum(weight * calculate_momentum_score({interval: data[interval]}) for interval, weight in intervals.items() if data[interval] is not None)
-                    results.append({"Symbol": symbol, "Momentum Score": weighted_score, "Timestamp": current_datetime})
+            # One scanner request per interval and batch instead of one per (symbol, interval)
+            all_data = fetch_multiple_data(symbols, exchange, screener, intervals, timeout=DEFAULT_TIMEOUT, cache=cache,
+                                           limiter=get_limiter(), quarantine=get_quarantine())
             
-            new_df = pd.DataFrame(results)
-            new_df['Average Momentum'] = new_df['Momentum Score'].mean()
+            # Every weighted score and the Average Momentum from one int8 matrix-vector product
+            scores, available, summary = score_universe(all_data, symbols, intervals)
+            new_df = scores_frame(symbols, scores, available, current_datetime)
             
             # Save the updated DataFrame to PostgreSQL
-            new_df.to_sql('momentum_scores', con=engine, if_exists='append', index=False)
+            snapshot_writer.write(new_df, summary['completeness'])
+            
+            reader.refresh()
             
-            # Combine new data with historical data for plotting
-            df = pd.concat([df, new_df], ignore_index=True)
+            # Cross-sectional breadth of the snapshot, one row in its own table; Regime is left to the collector
+            breadth = breadth_stats(new_df['Symbol'].tolist(), new_df['Momentum Score'].to_numpy())
+            write_breadth(engine, current_datetime, breadth)
+            per_symbol = symbol_breadth(new_df['Symbol'].tolist(), new_df['Momentum Score'].to_numpy())
             
             # Update plot
-            fig = update_plot(df)
+            fig = update_plot(plot_range)
             plot_placeholder.pyplot(fig)
             
-            # Display top 20 scores
-            long_df, short_df = display_top_20_scores(results, historical_df)
+            # Display top scores, re-ranking only the symbols whose score moved
+            ranking.set_reference(previous_scores)
+            ranking.sync(dict(zip(new_df['Symbol'], new_df['Momentum Score'])))
+            long_df, short_df = ranking.panels()
+            for panel in (long_df, short_df):
+                panel[['Z-Score', 'vs BTC']] = per_symbol.reindex(panel['Symbol']).to_numpy()
             
             # Update the placeholders with the latest data
             with long_scores_placeholder.container():
-                st.subheader("Top 20 Long Momentum Scores:")
-                st.dataframe(long_df[['Symbol', 'Momentum Score', 'Change']])
+                st.subheader(f"Top {top_n} Long Momentum Scores:")
+                st.dataframe(long_df[['Symbol', 'Momentum Score', 'Change', 'Z-Score', 'vs BTC']])
                 avg_change_long = long_df['Change'].mean()
-                st.metric("Average Change in Top 20 Long Scores", f"{avg_change_long:.2f}", f"{avg_change_long:.2f}")
+                st.metric(f"Average Change in Top {top_n} Long Scores", f"{avg_change_long:.2f}", f"{avg_change_long:.2f}")
             
             with short_scores_placeholder.container():
-                st.subheader("Top 20 Short Momentum Scores:")
-                st.dataframe(short_df[['Symbol', 'Momentum Score', 'Change']])
+                st.subheader(f"Top {top_n} Short Momentum Scores:")
+                st.dataframe(short_df[['Symbol', 'Momentum Score', 'Change', 'Z-Score', 'vs BTC']])
                 avg_change_short = short_df['Change'].mean()
-                st.metric("Average Change in Top 20 Short Scores", f"{avg_change_short:.2f}", f"{avg_change_short:.2f}")
+                st.metric(f"Average Change in Top {top_n} Short Scores", f"{avg_change_short:.2f}", f"{avg_change_short:.2f}")
+            
+            with breadth_placeholder.container():
+                if breadth['Symbols']:
+                    st.subheader("Market Breadth:")
+                    st.metric("Symbols Above +0.5", f"{breadth['Share Above']:.0%}")
+                    st.metric("Symbols Below -0.5", f"{breadth['Share Below']:.0%}")
+                    st.write(f"Median {breadth['P50']:.2f}, P10 {breadth['P10']:.2f}, P90 {breadth['P90']:.2f}, "
+                             f"Std {breadth['Std']:.2f}")
+            
+            with quarantine_placeholder.container():
+                quarantined = get_quarantine().report()
+                if quarantined:
+                    st.subheader(f"Quarantined Symbols ({len(quarantined)}):")
+                    st.dataframe(pd.DataFrame(quarantined))
             
             # Selectively clear cache
             selective_cache_clear()
@@ -349,7 +320,8 @@ def main():
         except Exception as e:
             log_error(f"An error occurred: {str(e)}")
             st.error(f"An error occurred. Please check the logs for details.")
-            time.sleep(600)  # Wait before retrying
+            # Throttling is absorbed by the rate limiter and cache, so retry on the normal cadence
+            time.sleep(60)
 
 if __name__ == "__main__":
     main()
@@ -7,7 +7,11 @@ import time
 import matplotlib.pyplot as plt
 import logging
 from sqlalchemy import create_engine
-from cachetools import TTLCache
+from maverick_schema import SnapshotWriter
+from maverick_cache import AnalysisCache
+from maverick_fetch import flights
+from maverick_db import HistoryReader
+from maverick_regime import regime_segments
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -22,9 +26,11 @@ DB_PORT = "5432"
 # Create SQLAlchemy engine
 db_url = f'postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
 engine = create_engine(db_url)
+# One snapshots row plus a narrow score row per symbol each cycle
+snapshot_writer = SnapshotWriter(engine)
 
-# Set up caching
-cache = TTLCache(maxsize=1000, ttl=300)  # Cache with 5-minute TTL
+# Set up caching, shared on disk with the collector and the other apps
+cache = AnalysisCache()
 
 # Set the page config
 st.set_page_config(
@@ -123,9 +129,9 @@ intervals = {
 
 @st.cache_data(ttl=300)
 def fetch_all_data(symbol, exchange, screener, interval):
-    cache_key = f"{symbol}_{exchange}_{screener}_{interval}"
-    if cache_key in cache:
-        return cache[cache_key]
+    analysis = cache.get(exchange, screener, symbol, interval)
+    if analysis is not None:
+        return analysis
     
     try:
         handler = TA_Handler(
@@ -135,8 +141,9 @@ def fetch_all_data(symbol, exchange, screener, interval):
             interval=interval,
             timeout=None
         )
-        analysis = handler.get_analysis()
-        cache[cache_key] = analysis
+        # Sessions asking for the same cell at the same time share one request
+        analysis = flights.do((exchange, screener, interval, symbol), handler.get_analysis)
+        cache.set(exchange, screener, symbol, interval, analysis)
         return analysis
     except Exception as e:
         logging.error(f"Error fetching data for {symbol} on {interval}: {str(e)}")
@@ -151,50 +158,18 @@ def calculate_momentum_score(data):
             score += weights.get(rating, 0)
     return score
 
-@st.cache_data(ttl=300)
-def get_historical_data():
-    query = """
-    SELECT * FROM momentum_scores 
-    WHERE "Timestamp" >= NOW() - INTERVAL '24 hours'
-    ORDER BY "Timestamp" DESC
-    """
-    return pd.read_sql(query, con=engine, parse_dates=['Timestamp'])
-
-def update_plot(df):
+def update_plot(history):
     fig, ax = plt.subplots(figsize=(12, 6))
     
-    df['Timestamp'] = pd.to_datetime(df['Timestamp'], utc=True)
-    df = df.sort_values('Timestamp')
-    
-    avg_momentum = df['Average Momentum']
-    
-    for i in range(1, len(avg_momentum)):
-        start = df['Timestamp'].iloc[i-1]
-        end = df['Timestamp'].iloc[i]
-        y1 = avg_momentum.iloc[i-1]
-        y2 = avg_momentum.iloc[i]
-        
-        if y1 > 0.5 and y2 > 0.5:
-            color = 'green'
-        elif y1 < -0.5 and y2 < -0.5:
-            color = 'red'
-        elif -0.5 <= y1 <= 0.5 and -0.5 <= y2 <= 0.5:
-            color = 'grey'
-        else:
-            if y2 > 0.5:
-                color = 'green'
-            elif y2 < -0.5:
-                color = 'red'
-            else:
-                color = 'grey'
-        
-        ax.plot([start, end], [y1, y2], color=color)
+    # Regimes are classified (with hysteresis) once per snapshot as it is read, not per draw
+    for timestamps, values, color in regime_segments(history.average_series(), history.regime_series()):
+        ax.plot(timestamps, values, color=color)
     
     ax.plot([], [], color='blue', label='Average Total Momentum Scores')
     
-    btc_data = df[df['Symbol'] == 'BTCUSDT.P']
+    btc_data = history.series('BTCUSDT.P')
     if not btc_data.empty:
-        ax.plot(btc_data['Timestamp'], btc_data['Momentum Score'], color='yellow', label='Momentum Score for BTCUSDT.P')
+        ax.plot(btc_data.index, btc_data.values, color='yellow', label='Momentum Score for BTCUSDT.P')
     else:
         logging.warning("No BTC data available for plotting")
     
@@ -210,7 +185,7 @@ def update_plot(df):
     
     return fig
 
-def display_top_20_scores(results, historical_df):
+def display_top_20_scores(results, previous_scores):
     sorted_results = sorted(results, key=lambda x: x['Momentum Score'], reverse=True)
     
     long_df = pd.DataFrame(sorted_results[:20])
@@ -218,7 +193,7 @@ def display_top_20_scores(results, historical_df):
     
     for df in [long_df, short_df]:
         if not df.empty:
-            df['Previous Score'] = df['Symbol'].map(historical_df.set_index('Symbol')['Momentum Score'].to_dict())
+            df['Previous Score'] = df['Symbol'].map(previous_scores)
             df['Change'] = df['Momentum Score'] - df['Previous Score'].fillna(0)
             df['Momentum Score'] = df['Momentum Score'].round(2)
             df['Change'] = df['Change'].round(2)
@@ -232,12 +207,14 @@ def main():
     long_scores_placeholder = st.empty()
     short_scores_placeholder = st.empty()
     
+    # Last 24 hours of scores, read from PostgreSQL once; later cycles only read the rows past the watermark
+    reader = HistoryReader(engine, symbols)
+    
     while True:
         try:
-            # Read existing data from PostgreSQL
-            df = get_historical_data()
-            df['Timestamp'] = df['Timestamp'].dt.tz_localize('UTC')
-            historical_df = df[['Symbol', 'Momentum Score']].copy()
+            reader.refresh()
+            # Each symbol's oldest score in the window, the reference for Change
+            previous_scores = reader.history.first_scores()
             
             results = []
             error_symbols = []
@@ -259,17 +236,17 @@ def main():
             new_df['Average Momentum'] = new_df['Momentum Score'].mean()
             
             # Save the updated DataFrame to PostgreSQL
-            new_df.to_sql('momentum_scores', con=engine, if_exists='append', index=False)
+            snapshot_writer.write(new_df)
             
-            # Combine new data with historical data for plotting
-            df = pd.concat([df, new_df], ignore_index=True)
+            # Pick up this snapshot and whatever the collector wrote since the last refresh
+            reader.refresh()
             
             # Update plot
-            fig = update_plot(df)
+            fig = update_plot(reader.history)
             plot_placeholder.pyplot(fig)
             
             # Display top 20 scores
-            long_df, short_df = display_top_20_scores(results, historical_df)
+            long_df, short_df = display_top_20_scores(results, previous_scores)
             
             # Update the placeholders with the latest data
             with long_scores_placeholder.container():
@@ -1,11 +1,20 @@
 import pandas as pd
 import numpy as np
-from tradingview_ta import TA_Handler, Interval
+from tradingview_ta import Interval
 from datetime import datetime, timezone, timedelta
 import time
 import logging
 from sqlalchemy import create_engine
-from cachetools import TTLCache
+from maverick_async import fetch_cells_with_retry
+from maverick_scheduler import RefreshScheduler
+from maverick_cache import AnalysisCache
+from maverick_ratelimit import RateLimiter
+from maverick_quarantine import SymbolQuarantine
+from maverick_scoring import IncrementalScores
+from maverick_breadth import breadth_stats, write_breadth
+from maverick_regime import REGIME_NAMES, RegimeClassifier
+from maverick_rescore import RatingArchive
+from maverick_schema import SnapshotWriter, apply_retention, ensure_schema
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -20,9 +29,20 @@ DB_PORT = "5432"
 # Create SQLAlchemy engine
 db_url = f'postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
 engine = create_engine(db_url)
+# Snapshots go to the normalized tables (scores through COPY); momentum_scores is the view over them
+snapshot_writer = SnapshotWriter(engine)
 
-# Set up caching
-cache = TTLCache(maxsize=1000, ttl=300)  # Cache with 5-minute TTL
+# Set up caching, shared on disk with the dashboards and screeners
+cache = AnalysisCache()
+
+# Token bucket, backoff and circuit breaker around every scanner request
+limiter = RateLimiter()
+
+# Symbols the scanner stopped answering for, rechecked on an exponential schedule
+quarantine = SymbolQuarantine()
+
+# Raw per-interval codes of every snapshot, so history can be re-scored under other weights
+archive = RatingArchive(engine)
 
 # List of symbols to be analyzed
 symbols = [
@@ -86,68 +106,84 @@ intervals = {
     Interval.INTERVAL_1_DAY: 0.1
 }
 
-def fetch_all_data(symbol, exchange, screener, interval):
-    cache_key = f"{symbol}_{exchange}_{screener}_{interval}"
-    if cache_key in cache:
-        return cache[cache_key]
-    
-    try:
-        handler = TA_Handler(
-            symbol=symbol,
-            exchange=exchange,
-            screener=screener,
-            interval=interval,
-            timeout=None
-        )
-        analysis = handler.get_analysis()
-        cache[cache_key] = analysis
-        return analysis
-    except Exception as e:
-        logging.error(f"Error fetching data for {symbol} on {interval}: {str(e)}")
-        return None
-
-def calculate_momentum_score(data):
-    weights = {'STRONG_BUY': 2, 'BUY': 1, 'NEUTRAL': 0, 'SELL': -1, 'STRONG_SELL': -2}
-    score = 0
-    for interval, analysis in data.items():
-        if analysis:
-            rating = analysis.summary['RECOMMENDATION'].upper()
-            score += weights.get(rating, 0)
-    return score
-
 def update_database():
+    # The collector alone migrates momentum_scores to the normalized tables, before any writes
+    ensure_schema(engine)
+    # Remembers the last analysis per (symbol, interval) between cycles
+    scheduler = RefreshScheduler(intervals)
+    # Scores and Average Momentum, updated only for the cells whose rating changed
+    scoring = IncrementalScores(symbols, intervals)
+    # Bull/neutral/bear state of Average Momentum, stored with every snapshot
+    regime = RegimeClassifier()
+    # Raw scores past the retention window are dropped once an hour, the rollups keep their history
+    last_retention = 0
+    
     while True:
+        cycle_start = time.time()
         try:
-            results = []
-            error_symbols = []
             current_datetime = datetime.now(timezone.utc)
             
-            for symbol in symbols:
-                data = {}
-                for interval, weight in intervals.items():
-                    analysis = fetch_all_data(symbol, exchange, screener, interval)
-                    data[interval] = analysis
-                
-                if all(value is None for value in data.values()):
-                    error_symbols.append(symbol)
-                else:
-                    weighted_score = sum(weight * calculate_momentum_score({interval: data[interval]}) for interval, weight in intervals.items() if data[interval] is not None)
-                    results.append({"Symbol": symbol, "Momentum Score": weighted_score, "Timestamp": current_datetime})
+            # Only refetch cells whose candle rolled over or whose staleness budget ran out;
+            # failed cells are retried within this cycle and otherwise keep their last value
+            due = scheduler.due_cells(symbols)
+            fetched, report = fetch_cells_with_retry(due, exchange, screener, cache=cache, limiter=limiter,
+                                                     quarantine=quarantine)
+            scheduler.update(fetched)
+            deltas = scoring.apply(fetched)
+            # Cells that failed for several candles, or whose symbol the scanner dropped, are
+            # reported missing instead of frozen at their last rating
+            expired = scheduler.expire()
+            expired += scheduler.forget([key for key, analysis in fetched.items() if analysis is None
+                                         and quarantine.is_quarantined(exchange, screener, key[0])])
+            if expired:
+                deltas += scoring.expire(expired)
+                logging.warning(f"No data for {len(expired)} cells past their max age or quarantined: "
+                                f"{', '.join(sorted({symbol for symbol, _ in expired}))}")
+            logging.info(f"Fetched {report['fetched']} of {report['requested']} due cells "
+                         f"({report['retried']} retried in {report['rounds']} rounds), cache stats: {cache.stats()}")
+            logging.info(f"Rate limiter: {limiter.status()}")
+            if report['quarantined']:
+                logging.info(f"Quarantined symbols: {', '.join(quarantine.symbols(exchange))}")
             
-            new_df = pd.DataFrame(results)
-            new_df['Average Momentum'] = new_df['Momentum Score'].mean()
+            summary = scoring.summary()
+            logging.info(f"{len(deltas)} symbols changed score: "
+                         f"{', '.join(f'{symbol} {new:+.2f}' if new is not None else f'{symbol} dropped' for symbol, previous, new in deltas[:20])}")
             
-            # Save the updated DataFrame to PostgreSQL
-            new_df.to_sql('momentum_scores', con=engine, if_exists='append', index=False)
+            if summary['count']:
+                new_df = scoring.frame(current_datetime)
+                
+                # The collector is the only writer that classifies regimes; the snapshot and its
+                # breadth row both carry the result
+                previous_regime = regime.state
+                current_regime = regime.update(scoring.average)
+                if current_regime != previous_regime:
+                    logging.warning(f"Momentum regime changed from {REGIME_NAMES[previous_regime]} to "
+                                    f"{REGIME_NAMES[current_regime]} (Average Momentum {scoring.average:.2f})")
+                
+                # Save the updated DataFrame to PostgreSQL
+                snapshot_writer.write(new_df, summary['completeness'], current_regime)
+                
+                # Cross-sectional breadth and regime of the snapshot, one row in its own table
+                breadth = breadth_stats(new_df['Symbol'].tolist(), new_df['Momentum Score'].to_numpy())
+                breadth['Regime'] = current_regime
+                write_breadth(engine, current_datetime, breadth)
+                
+                archive.append(current_datetime, symbols, list(intervals), scoring.codes)
             
-            logging.info(f"Database updated at {current_datetime}")
+            logging.info(f"Database updated at {current_datetime}: {summary['count']} symbols "
+                         f"({summary['long']} long, {summary['short']} short, average {scoring.average}), "
+                         f"{len(symbols) - summary['count']} without data, completeness {summary['completeness']:.1%}")
             
-            # Sleep for 1 minute before the next update
-            time.sleep(60)
+            if time.time() - last_retention >= 3600:
+                raw, rollups = apply_retention(engine)
+                last_retention = time.time()
+                logging.info(f"Retention dropped {raw} raw score partitions/rows and {rollups} rollup rows")
             
         except Exception as e:
             logging.error(f"An error occurred: {str(e)}")
-            time.sleep(600)  # Wait 10 minutes before retrying
+        
+        # Keep the 1 minute cadence even after an error, fetched cells survive in the scheduler
+        time.sleep(max(0, 60 - (time.time() - cycle_start)))
 
 if __name__ == "__main__":
     update_database()
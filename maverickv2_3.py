@@ -2,8 +2,10 @@ import streamlit as st
 import csv
 import pandas as pd
 import numpy as np
-from scipy.stats import pearsonr
-from tradingview_ta import TA_Handler, Interval
+from tradingview_ta import Interval
+from maverick_fetch import DEFAULT_TIMEOUT, fetch_multiple_data
+from maverick_cache import AnalysisCache
+from maverick_store import SnapshotStore
 
 # Set the page config
 st.set_page_config(
@@ -45,6 +47,9 @@ st.sidebar.image(logo_url, use_column_width=True)
 st.sidebar.title("Navigation")
 page = st.sidebar.radio("Go to", ["Home", "ValenBot"])
 
+# Analysis cache shared on disk with the collector and the dashboards
+cache = AnalysisCache()
+
 # List of symbols to be analyzed, each appended with ".P"
 symbols = [
     "10000LADYSUSDT.P", "10000NFTUSDT.P", "1000BONKUSDT.P", "1000BTTUSDT.P", 
@@ -95,18 +100,6 @@ symbols = [
     "ZECUSDT.P", "ZENUSDT.P", "ZILUSDT.P", "ZRXUSDT.P"
 ]
 
-# Function to fetch data using TradingView TA Handler
-def fetch_all_data(symbol, exchange, screener, interval):
-    handler = TA_Handler(
-        symbol=symbol,
-        exchange=exchange,
-        screener=screener,
-        interval=interval,
-        timeout=None
-    )
-    analysis = handler.get_analysis()
-    return analysis
-
 # Function to save data to a CSV file
 def save_to_csv(data, filename='coin_analysis_data.csv'):
     try:
@@ -139,38 +132,17 @@ def save_to_csv(data, filename='coin_analysis_data.csv'):
     except Exception as e:
         st.error(f"Error saving data to CSV: {e}")
 
-# Function to calculate weighted Bollinger Bands media
-def calculate_weighted_bb_media(data, timeframes):
-    bb_lower_column = 'BB.lower'
-    bb_upper_column = 'BB.upper'
-    bb_data = {tf: [] for tf in timeframes}
+# Function to calculate weighted Bollinger Bands media for every symbol at once
+def calculate_weighted_bb_media(store):
+    bb_lower = store.column('BB.lower')
+    bb_upper = store.column('BB.upper')
+    # Missing or zero bands don't count, same as the old per-symbol loop
+    valid = (bb_lower != 0) & (bb_upper != 0) & ~np.isnan(bb_lower) & ~np.isnan(bb_upper)
+    bb_media = np.where(valid, (bb_lower + bb_upper) / 2, np.nan)
 
-    for (symbol, interval), analysis in data.items():
-        if analysis is None:
-            continue
-        interval_str = interval
-        bb_lower = analysis.indicators.get(bb_lower_column, 0)
-        bb_upper = analysis.indicators.get(bb_upper_column, 0)
-        if bb_lower and bb_upper:
-            bb_media = (bb_lower + bb_upper) / 2
-            bb_data[interval_str].append(bb_media)
-
-    correlations = pd.DataFrame(index=timeframes, columns=timeframes)
-    for tf1 in timeframes:
-        for tf2 in timeframes:
-            if tf1 != tf2:
-                try:
-                    corr_values = pearsonr(bb_data[tf1], bb_data[tf2])[0]
-                    correlations.loc[tf1, tf2] = corr_values
-                except ValueError:
-                    correlations.loc[tf1, tf2] = 0
-            else:
-                correlations.loc[tf1, tf2] = 1.0
-
-    weights = correlations.mean(axis=1)
-    weighted_bb_media = sum(weights[tf] * np.mean(bb_data[tf]) for tf in timeframes if len(bb_data[tf]) > 0) / sum(weights)
-
-    return weighted_bb_media
+    # A symbol has one BB media per timeframe, too few points for pearsonr to correlate two
+    # timeframes, so every timeframe ends up with the same weight 1 / len(timeframes)
+    return np.nansum(bb_media, axis=1) / len(store.intervals)
 
 def home():
     st.title('#MaryBot - Simbolos para Estrategia de Cobertura')
@@ -200,16 +172,9 @@ def home():
     matches = []
 
     if st.button("Has la Magia"):
-        data = {}
-        errors = []
-        for symbol in symbols:
-            for interval in intervals:
-                try:
-                    analysis = fetch_all_data(symbol, exchange, screener, interval)
-                    data[(symbol, interval_str_map[interval])] = analysis
-                except Exception as e:
-                    data[(symbol, interval_str_map[interval])] = None
-                    errors.append(f"Error fetching data for {symbol} at interval {interval_str_map[interval]}: {e}")
+        # One scanner request per interval and batch; cells the collector or another app fetched come from the cache
+        all_data = fetch_multiple_data(symbols, exchange, screener, intervals, timeout=DEFAULT_TIMEOUT, cache=cache)
+        data = {(symbol, interval_str_map[interval]): analysis for (symbol, interval), analysis in all_data.items()}
 
         if data:
             save_to_csv(data)
@@ -221,27 +186,25 @@ def home():
                 mime='text/csv'
             )
 
-            weighted_bb_media_dict = {}
-            for symbol in symbols:
-                timeframes = list(interval_str_map.values())
-                weighted_bb_media = calculate_weighted_bb_media({k: v for k, v in data.items() if k[0] == symbol}, timeframes)
-                weighted_bb_media_dict[symbol] = weighted_bb_media
-
-            for symbol, weighted_bb_media in weighted_bb_media_dict.items():
-                if weighted_bb_media is not None:
-                    # Fetch the current price from the 'close' indicator at the 30m interval
-                    if (symbol, '30m') in data and data[(symbol, '30m')] is not None:
-                        current_price = data[(symbol, '30m')].indicators.get('close', 0)
-                        lower_bound = weighted_bb_media * 0.96
-                        upper_bound = weighted_bb_media * 1.04
-                        if lower_bound <= current_price <= upper_bound:
-                            percentage = ((current_price - weighted_bb_media) / weighted_bb_media) * 100
-                            matches.append({
-                                "Symbol": symbol,
-                                "Current Price": current_price,
-                                "Weighted BB Media": weighted_bb_media,
-                                "Percentage": percentage
-                            })
+            # Columnar snapshot: one slice per indicator instead of a dict lookup per (symbol, interval)
+            store = SnapshotStore.from_analyses(data, symbols, list(interval_str_map.values()))
+            weighted_bb_media = calculate_weighted_bb_media(store)
+
+            # Current price from the 'close' indicator at the 30m interval
+            current_price = store.column('close', '30m')
+            lower_bound = weighted_bb_media * 0.96
+            upper_bound = weighted_bb_media * 1.04
+            in_range = (lower_bound <= current_price) & (current_price <= upper_bound)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                percentage = ((current_price - weighted_bb_media) / weighted_bb_media) * 100
+
+            for i in np.flatnonzero(in_range):
+                matches.append({
+                    "Symbol": store.symbols[i],
+                    "Current Price": float(current_price[i]),
+                    "Weighted BB Media": float(weighted_bb_media[i]),
+                    "Percentage": float(percentage[i])
+                })
 
             if matches:
                 df = pd.DataFrame(matches)
@@ -1,8 +1,10 @@
 import streamlit as st
 import pandas as pd
-from tradingview_ta import TA_Handler, Interval
+from tradingview_ta import Interval
 import io
 from datetime import datetime
+from maverick_async import fetch_grid
+from maverick_cache import AnalysisCache
 
 # Set the page config
 st.set_page_config(
@@ -36,6 +38,9 @@ st.markdown("""
     </style>
     """, unsafe_allow_html=True)
 
+# Analysis cache shared on disk with the collector and the dashboards
+cache = AnalysisCache()
+
 # List of symbols to be analyzed, each appended with ".P"
 symbols = [
     "10000LADYSUSDT.P", "10000NFTUSDT.P", "1000BONKUSDT.P", "1000BTTUSDT.P", 
@@ -86,18 +91,6 @@ symbols = [
     "ZECUSDT.P", "ZENUSDT.P", "ZILUSDT.P", "ZRXUSDT.P"
 ]
 
-# Fetch data function
-def fetch_all_data(symbol, exchange, screener, interval):
-    handler = TA_Handler(
-        symbol=symbol,
-        exchange=exchange,
-        screener=screener,
-        interval=interval,
-        timeout=None
-    )
-    analysis = handler.get_analysis()
-    return analysis
-
 # Calculate momentum score function
 def calculate_momentum_score(data):
     weights = {'STRONG_BUY': 2, 'BUY': 1, 'NEUTRAL': 0, 'SELL': -1, 'STRONG_SELL': -2}
@@ -131,14 +124,13 @@ def main():
         error_symbols = []
         current_datetime = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
+        progress_bar = st.progress(0)
+        all_data = fetch_grid(symbols, exchange, screener, list(intervals),
+                              on_progress=lambda completed, total: progress_bar.progress(completed / total),
+                              cache=cache)
+        
         for symbol in symbols:
-            data = {}
-            for interval, weight in intervals.items():
-                try:
-                    analysis = fetch_all_data(symbol, exchange, screener, interval)
-                    data[interval] = analysis
-                except Exception as e:
-                    data[interval] = None
+            data = {interval: all_data[(symbol, interval)] for interval in intervals}
             
             if all(value is None for value in data.values()):
                 error_symbols.append(symbol)